@@ -1,16 +1,42 @@
 from flask import Flask
 from flask_cors import CORS
 from config import config
+from .services import (AgregadosDashboard, BackendClient, CacheCalculo, CacheFragmentos, CachePDF,
+                       CatalogoEstudos, CenarioCache, Equivalencias, ExportadorLote, FeedCenarios,
+                       GerenciadorTarefas, Metricas, ResultadosCalculo, Revalidacao)
 
 def create_app(config_name='default'):
+    if config_name not in config:
+        raise ValueError(f"Configuração desconhecida: {config_name!r} (opções: {', '.join(config)})")
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
     # Inicializar extensões
     CORS(app)
+    Metricas(app)
+    BackendClient(app)
+    CenarioCache(app)
+    CacheCalculo(app)
+    ResultadosCalculo(app)
+    AgregadosDashboard(app)
+    GerenciadorTarefas(app)
+    Revalidacao(app)
+    CachePDF(app)
+    ExportadorLote(app)
+    Equivalencias(app)
+    CacheFragmentos(app)
+    CatalogoEstudos(app)
+    FeedCenarios(app)
     
     # Registrar blueprints
     from .routes import views_bp
     app.register_blueprint(views_bp)
     
+    # As dependências async só são importadas quando ativadas
+    if app.config['ASYNC_VIEWS']:
+        from .services.backend_async import AsyncBackendClient
+        from .routes.views_async import registrar_views_async
+        AsyncBackendClient(app)
+        registrar_views_async(app)
+    
     return app 
\ No newline at end of file
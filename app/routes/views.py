@@ -1,117 +1,178 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, flash, session, send_file
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for, flash, session, stream_with_context, send_file, abort
 from datetime import datetime
-try:
-    import requests
-except ImportError:
-    print("Erro ao importar o módulo requests. Instalando...")
-    import subprocess
-    subprocess.check_call(["pip", "install", "requests"])
-    import requests
 import json
-import pdfkit
 import os
-import tempfile
-from fpdf import FPDF
+import requests
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from ..services import (AgregadosDashboard, Pagina, ParametrosListagem, get_backend, get_cenario_cache,
+                        get_tarefas, buscar_cenario, buscar_dashboard, buscar_pagina,
+                        excluir_todos_cenarios, registrar_exclusao, registrar_inclusao,
+                        CachePDF, get_pdf_cache, buscar_cenarios, filtrar_e_ordenar, get_exportador,
+                        get_equivalencias, calcular_lote, caminho_resultado, formato_arquivo,
+                        guardar_envio, get_cache_calculo, get_resultados, get_fragmentos,
+                        hash_cenario, get_catalogo_estudos, get_metricas, medir, get_feed,
+                        dados_graficos, comprimir, dados_obsoletos)
 
 views_bp = Blueprint('views', __name__)
 
+ERRO_BACKEND = "O serviço de cálculo está indisponível no momento. Tente novamente em alguns instantes."
+
 @views_bp.route('/')
 def index():
-    return render_template('index.html', config=current_app.config)
+    return _pagina_estatica(('index',), lambda: render_template('index.html', config=current_app.config))
+
+def _pagina_condicional(etag, renderizar, cache_control, modificado_em=None, mimetype='text/html'):
+    """Resposta com ETag e Cache-Control; 304 sem renderizar se o navegador já tem a versão"""
+    conteudo = '' if request.if_none_match.contains_weak(etag) else renderizar()
+    response = current_app.response_class(conteudo, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    if modificado_em is not None:
+        response.last_modified = modificado_em
+    return response.make_conditional(request)
+
+def _pagina_estatica(chave, renderizar, modificado_em=None):
+    """Página sem dados do backend, renderizada uma vez por worker"""
+    fragmentos = get_fragmentos()
+    html, etag = fragmentos.obter(chave, renderizar)
+    modificado_em = max(fragmentos.modificado_em, modificado_em or fragmentos.modificado_em)
+    return _pagina_condicional(etag, lambda: html, current_app.config['CACHE_CONTROL_ESTATICO'],
+                               modificado_em)
 
 @views_bp.route('/dashboard')
 def dashboard():
-    response = requests.get(f"{current_app.config['BACKEND_URL']}/api/cenarios")
-    cenarios = response.json()
-    
-    # Calcular totais
-    total_cenarios = len(cenarios)
-    total_creditos = sum(cenario.get('total_creditos', 0) for cenario in cenarios)
-    valor_estimado = sum(cenario.get('valor_estimado', 0) for cenario in cenarios)
-    
-    # Calcular área total
-    area_total = sum(
-        cenario.get('area_pastagem', 0) +
-        cenario.get('area_florestal', 0) +
-        cenario.get('area_renovacao_cultura', 0) +
-        cenario.get('area_integracao_lavoura', 0)
-        for cenario in cenarios
-    )
-    
-    # Calcular totais por metodologia
-    totais = {
-        'credito_pastagem': sum(cenario.get('credito_pastagem', 0) for cenario in cenarios),
-        'credito_florestal': sum(cenario.get('credito_florestal', 0) for cenario in cenarios),
-        'credito_renovacao': sum(cenario.get('credito_renovacao', 0) for cenario in cenarios),
-        'credito_integracao': sum(cenario.get('credito_integracao', 0) for cenario in cenarios)
-    }
-    
-    # Preparar dados para o gráfico de séries temporais
-    datas = [cenario.get('data_calculo', '') for cenario in cenarios]
-    creditos_acumulados = []
-    acumulado = 0
-    for cenario in cenarios:
-        acumulado += cenario.get('total_creditos', 0)
-        creditos_acumulados.append(acumulado)
+    dados = buscar_dashboard(serie=False)
+    # Apenas a página pedida é renderizada; os totais cobrem todos os cenários
+    parametros = _parametros_dashboard()
+    return _renderizar_dashboard(dados, buscar_pagina(parametros), parametros)
+
+def _parametros_dashboard():
+    return ParametrosListagem.from_args(
+        request.args,
+        limite_padrao=current_app.config['DASHBOARD_PAGE_SIZE'],
+        limite_maximo=current_app.config['DASHBOARD_MAX_PAGE_SIZE'])
+
+def _renderizar_dashboard(dados, pagina, parametros):
+    if dados is None:
+        flash('Erro ao carregar os cenários.', 'error')
+        dados = [], AgregadosDashboard().resumo()
+    _, agregados = dados
+    pagina = pagina or Pagina([], 0, parametros)
     
-    return render_template('dashboard.html', 
-                         cenarios=cenarios,
-                         total_cenarios=total_cenarios,
-                         total_creditos=total_creditos,
-                         valor_estimado=valor_estimado,
-                         area_total=area_total,
-                         totais=totais,
-                         datas=datas,
-                         creditos_acumulados=creditos_acumulados)
+    # Só os totais dos cards vão no HTML; os gráficos vêm de /api/dashboard/graficos
+    return render_template('dashboard.html', cenarios=pagina.itens, pagina=pagina,
+                         tarefa_id=request.args.get('tarefa'), feed_cursor=get_feed().cursor,
+                         **{chave: agregados[chave] for chave in
+                            ('total_cenarios', 'total_creditos', 'valor_estimado', 'area_total')})
+
+@views_bp.route('/api/dashboard/graficos')
+def graficos_dashboard():
+    """Dados dos gráficos do dashboard em colunas; ``pontos`` limita o tamanho da série"""
+    return _responder_graficos(buscar_dashboard())
+
+def _responder_graficos(dados):
+    if dados is None:
+        return jsonify({'erro': 'Erro ao carregar os cenários'}), 502
+    config = current_app.config
+    pontos = request.args.get('pontos', config['GRAFICOS_PONTOS'], type=int)
+    pontos = min(max(pontos, 2), config['GRAFICOS_MAX_PONTOS'])
+    _, agregados = dados
+    conteudo = json.dumps(dados_graficos(agregados, pontos), ensure_ascii=False, separators=(',', ':'))
+    response = _pagina_condicional(get_fragmentos().etag('graficos', conteudo), lambda: conteudo,
+                                   config['CACHE_CONTROL_CENARIOS'], mimetype='application/json')
+    return comprimir(response)
+
+@views_bp.route('/dashboard/eventos')
+def eventos_dashboard():
+    """Stream (Server-Sent Events) de inclusões, exclusões e totais para o dashboard"""
+    # Na reconexão o navegador informa o último evento recebido
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    eventos = get_feed().transmitir(cursor, ParametrosListagem.from_args(request.args))
+    response = current_app.response_class(stream_with_context(eventos), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Evita que proxies (nginx) acumulem os eventos antes de repassá-los
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @views_bp.route('/creditos', methods=['GET', 'POST'])
 def creditos():
     if request.method == 'POST':
-        # Validação dos dados
-        area_pastagem = float(request.form.get('area_pastagem', 0))
-        area_florestal = float(request.form.get('area_florestal', 0))
-        area_renovacao_cultura = float(request.form.get('area_renovacao_cultura', 0))
-        area_integracao_lavoura = float(request.form.get('area_integracao_lavoura', 0))
-        
-        # Verifica se pelo menos uma área foi preenchida
-        if area_pastagem == 0 and area_florestal == 0 and area_renovacao_cultura == 0 and area_integracao_lavoura == 0:
+        data = _dados_calculo()
+        if data is None:
             return render_template('calculadora_creditos.html', error="Por favor, preencha pelo menos uma área.")
         
-        # Dados para a API
-        data = {
-            "area_pastagem": area_pastagem,
-            "area_florestal": area_florestal,
-            "area_renovacao_cultura": area_renovacao_cultura,
-            "area_integracao_lavoura": area_integracao_lavoura
-        }
+        # Mesmas áreas já calculadas: o resultado vem do cache, sem chamar a API
+        resultados = get_cache_calculo().obter(data)
+        if resultados is not None:
+            return _exibir_resultados(resultados)
         
         # Faz a requisição para a API
-        response = requests.post(
-            f"{current_app.config['BACKEND_URL']}/api/calcular",
-            json=data,
-            headers={'Content-Type': 'application/json'}
-        )
+        try:
+            response = get_backend().post(
+                "/api/calcular",
+                json=data,
+                headers={'Content-Type': 'application/json'}
+            )
+        except requests.RequestException:
+            return render_template('calculadora_creditos.html', error=ERRO_BACKEND), 503
         
         if response.status_code == 200:
             resultados = response.json()
-            # Armazena os resultados na sessão
-            session['resultados'] = resultados
-            return redirect(url_for('views.creditos'))
+            # O cálculo gera um novo cenário no backend
+            cenario_id = resultados.get('id') or resultados.get('cenario_id')
+            cenario = buscar_cenario(cenario_id) if cenario_id else None
+            return _concluir_calculo(data, resultados, cenario)
         else:
             return render_template('calculadora_creditos.html', error="Erro ao calcular créditos. Por favor, tente novamente.")
     
+    return _renderizar_creditos()
+
+def _dados_calculo():
+    """Áreas do formulário para a API, ou None se nenhuma foi preenchida"""
+    # Validação dos dados
+    area_pastagem = float(request.form.get('area_pastagem', 0))
+    area_florestal = float(request.form.get('area_florestal', 0))
+    area_renovacao_cultura = float(request.form.get('area_renovacao_cultura', 0))
+    area_integracao_lavoura = float(request.form.get('area_integracao_lavoura', 0))
+    
+    # Verifica se pelo menos uma área foi preenchida
+    if area_pastagem == 0 and area_florestal == 0 and area_renovacao_cultura == 0 and area_integracao_lavoura == 0:
+        return None
+    
+    # Dados para a API
+    return {
+        "area_pastagem": area_pastagem,
+        "area_florestal": area_florestal,
+        "area_renovacao_cultura": area_renovacao_cultura,
+        "area_integracao_lavoura": area_integracao_lavoura
+    }
+
+def _concluir_calculo(data, resultados, cenario):
+    get_cache_calculo().guardar(data, resultados)
+    if cenario is not None:
+        registrar_inclusao(cenario)
+    else:
+        get_cenario_cache().invalidar_lista()
+        get_feed().sincronizar()
+    return _exibir_resultados(resultados)
+
+def _exibir_resultados(resultados):
+    # A sessão guarda apenas o id; os resultados ficam no servidor
+    session['resultado_id'] = get_resultados().guardar(resultados)
+    return redirect(url_for('views.creditos'))
+
+def _renderizar_creditos():
     # GET request - renderiza a página com os resultados da sessão se existirem
-    resultados = session.get('resultados')
+    resultado_id = session.pop('resultado_id', None)
+    resultados = get_resultados().obter(resultado_id)
     if resultados:
-        # Limpa os resultados da sessão após recuperá-los
-        session.pop('resultados', None)
-        
         # Adicionar a função now() para o template
         def now():
             return datetime.now()
             
         return render_template('creditos.html', 
                              resultados=resultados,
+                             resultado_id=resultado_id,
                              potencial_credito=resultados.get('total_creditos', 0),
                              valor_estimado=resultados.get('valor_estimado', 0),
                              area_pastagem=resultados.get('resultados', {}).get('pastagem', {}).get('area', 0),
@@ -122,18 +183,39 @@ def creditos():
     
     return render_template('calculadora_creditos.html')
 
+@views_bp.route('/creditos/lote', methods=['GET', 'POST'])
+def creditos_lote():
+    """Cálculo de várias propriedades a partir de um arquivo CSV ou JSON"""
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        formato = formato_arquivo(arquivo.filename) if arquivo else None
+        if formato is None:
+            return render_template('calculo_lote.html',
+                                   error="Envie um arquivo .csv, .json ou .jsonl com as áreas das propriedades.")
+        caminho = guardar_envio(arquivo)
+        tarefa = get_tarefas().iniciar('calculo_lote', calcular_lote, caminho, formato)
+        return redirect(url_for('views.creditos_lote', tarefa=tarefa.id))
+    
+    return render_template('calculo_lote.html', tarefa_id=request.args.get('tarefa'))
+
+@views_bp.route('/creditos/lote/<tarefa_id>.csv')
+def resultado_lote(tarefa_id):
+    if not tarefa_id.isalnum():
+        abort(404)
+    caminho = caminho_resultado(tarefa_id)
+    if not os.path.exists(caminho):
+        abort(404)
+    return send_file(caminho, mimetype='text/csv', as_attachment=True,
+                     download_name=f'resultados_lote_{tarefa_id[:8]}.csv')
+
 @views_bp.route('/resultado')
 def resultado():
-    # Obter os resultados da sessão ou parâmetros
+    # Resultados guardados no servidor, referenciados pelo id na URL
     nome_cenario = request.args.get('nome_cenario', '')
-    resultados_json = request.args.get('resultados', '{}')
-    
-    # Converter a string JSON para dicionário
-    import json
-    try:
-        resultados = json.loads(resultados_json)
-    except:
-        resultados = {}
+    resultados = get_resultados().obter(request.args.get('id'))
+    if resultados is None:
+        flash('Resultado não encontrado ou expirado.', 'error')
+        return redirect(url_for('views.creditos'))
     
     # Adicionar a função now() para o template
     def now():
@@ -146,278 +228,235 @@ def resultado():
 
 @views_bp.route('/detalhes/<int:id>')
 def detalhes_cenario(id):
-    response = requests.get(f"{current_app.config['BACKEND_URL']}/api/cenarios/{id}")
-    cenario = response.json()
-    return render_template('detalhes.html', cenario=cenario)
+    return _renderizar_cenario('detalhes.html', buscar_cenario(id))
+
+def _renderizar_cenario(template, cenario, versao='', **contexto):
+    if cenario is None:
+        flash('Erro ao carregar o cenário.', 'error')
+        return redirect(url_for('views.dashboard'))
+    # A ETag muda com os dados do cenário (e com ``versao``, se a página depende de mais dados);
+    # a página com o aviso de dados desatualizados nunca é confundida com a normal
+    etag = get_fragmentos().etag(template, versao, hash_cenario(cenario), dados_obsoletos() or '')
+    return _pagina_condicional(etag, lambda: render_template(template, cenario=cenario, **contexto),
+                               current_app.config['CACHE_CONTROL_CENARIOS'])
 
 @views_bp.route('/estudos-caso')
 def estudos_caso():
-    # Dados estáticos dos estudos de caso
-    estudos = [
-        {
-            'id': 1,
-            'titulo': 'Recuperação de Pastagens em MG',
-            'localizacao': 'Minas Gerais',
-            'area': 500,
-            'metodologia': 'VCS VM0032',
-            'resultados': {
-                'creditos_gerados': 350,
-                'valor_estimado': 17500,
-                'periodo': '2023-2024'
-            },
-            'descricao': 'Projeto com 500 hectares de pastagens recuperadas, com sequestro médio de 0,7 tCO2e/ha/ano.',
-            'contato': 'contato@fazendamg.com.br'
-        },
-        {
-            'id': 2,
-            'titulo': 'Reflorestamento no PR',
-            'localizacao': 'Paraná',
-            'area': 200,
-            'metodologia': 'AR-ACM0003',
-            'resultados': {
-                'creditos_gerados': 2000,
-                'valor_estimado': 100000,
-                'periodo': '2022-2024'
-            },
-            'descricao': 'Reflorestamento de 200 hectares com espécies nativas, sequestro de 10 tCO2e/ha/ano.',
-            'contato': 'contato@florestapr.com.br'
-        },
-        {
-            'id': 3,
-            'titulo': 'Integração Lavoura-Pecuária em MT',
-            'localizacao': 'Mato Grosso',
-            'area': 1200,
-            'metodologia': 'VCS VM0017',
-            'resultados': {
-                'creditos_gerados': 3600,
-                'valor_estimado': 180000,
-                'periodo': '2021-2024'
-            },
-            'descricao': 'Implementação em 1.200 hectares, redução de fertilizantes e aumento da produtividade.',
-            'contato': 'contato@ilpmt.com.br'
-        }
-    ]
-    return render_template('estudos_caso.html', estudos=estudos)
+    catalogo = get_catalogo_estudos()
+    filtros = _filtros_estudos()
+    
+    def renderizar():
+        return render_template('estudos_caso.html', estudos=catalogo.filtrar(*filtros),
+                               estado=filtros[0], metodologia=filtros[1], busca=filtros[2],
+                               estados=catalogo.estados, metodologias=catalogo.metodologias)
+    return _pagina_estatica(('estudos_caso', catalogo.versao) + filtros, renderizar, catalogo.modificado_em)
+
+def _filtros_estudos():
+    """Filtros ``estado``, ``metodologia`` e busca ``q`` dos estudos de caso"""
+    return tuple(request.args.get(nome, '').strip() for nome in ('estado', 'metodologia', 'q'))
 
 @views_bp.route('/estudos-caso/<int:estudo_id>')
 def detalhes_estudo(estudo_id):
-    # Dados estáticos dos estudos de caso
-    estudos = {
-        1: {
-            'id': 1,
-            'titulo': 'Recuperação de Pastagens em MG',
-            'localizacao': 'Minas Gerais',
-            'area': 500,
-            'metodologia': 'VCS VM0032',
-            'resultados': {
-                'creditos_gerados': 350,
-                'valor_estimado': 17500,
-                'periodo': '2023-2024'
-            },
-            'descricao': 'Projeto com 500 hectares de pastagens recuperadas, com sequestro médio de 0,7 tCO2e/ha/ano.',
-            'contato': 'contato@fazendamg.com.br'
-        },
-        2: {
-            'id': 2,
-            'titulo': 'Reflorestamento no PR',
-            'localizacao': 'Paraná',
-            'area': 200,
-            'metodologia': 'AR-ACM0003',
-            'resultados': {
-                'creditos_gerados': 2000,
-                'valor_estimado': 100000,
-                'periodo': '2022-2024'
-            },
-            'descricao': 'Reflorestamento de 200 hectares com espécies nativas, sequestro de 10 tCO2e/ha/ano.',
-            'contato': 'contato@florestapr.com.br'
-        },
-        3: {
-            'id': 3,
-            'titulo': 'Integração Lavoura-Pecuária em MT',
-            'localizacao': 'Mato Grosso',
-            'area': 1200,
-            'metodologia': 'VCS VM0017',
-            'resultados': {
-                'creditos_gerados': 3600,
-                'valor_estimado': 180000,
-                'periodo': '2021-2024'
-            },
-            'descricao': 'Implementação em 1.200 hectares, redução de fertilizantes e aumento da produtividade.',
-            'contato': 'contato@ilpmt.com.br'
-        }
-    }
-    
-    estudo = estudos.get(estudo_id)
+    catalogo = get_catalogo_estudos()
+    estudo = catalogo.obter(estudo_id)
     if not estudo:
         flash('Estudo de caso não encontrado.', 'error')
         return redirect(url_for('views.estudos_caso'))
         
-    return render_template('detalhes_estudo.html', estudo=estudo)
+    return _pagina_estatica(('detalhes_estudo', catalogo.versao, estudo_id),
+                            lambda: render_template('detalhes_estudo.html', estudo=estudo),
+                            catalogo.modificado_em)
+
+@views_bp.route('/api/estudos-caso')
+def api_estudos_caso():
+    """Estudos de caso em JSON, com os mesmos filtros da página"""
+    catalogo = get_catalogo_estudos()
+    filtros = _filtros_estudos()
+    etag = get_fragmentos().etag('api_estudos_caso', catalogo.versao, *filtros)
+    return _pagina_condicional(etag, lambda: catalogo.para_json(catalogo.filtrar(*filtros)),
+                               current_app.config['CACHE_CONTROL_ESTATICO'], catalogo.modificado_em,
+                               mimetype='application/json')
+
+@views_bp.route('/api/estudos-caso/<int:estudo_id>')
+def api_estudo_caso(estudo_id):
+    catalogo = get_catalogo_estudos()
+    estudo = catalogo.obter(estudo_id)
+    if estudo is None:
+        return jsonify({'erro': 'Estudo de caso não encontrado'}), 404
+    etag = get_fragmentos().etag('api_estudo_caso', catalogo.versao, estudo_id)
+    return _pagina_condicional(etag, lambda: catalogo.para_json([estudo])[1:-1],
+                               current_app.config['CACHE_CONTROL_ESTATICO'], catalogo.modificado_em,
+                               mimetype='application/json')
+
+@views_bp.route('/api/calculo/<componente>')
+def componente_calculo(componente):
+    """Resultado já calculado de uma metodologia para a área pedida (modo "e se")"""
+    try:
+        area = float(request.args.get('area', 0))
+    except ValueError:
+        return jsonify({'erro': 'Área inválida'}), 400
+    resultado = get_cache_calculo().obter_componente(componente, area)
+    if resultado is None:
+        return jsonify({'erro': 'Resultado ainda não calculado'}), 404
+    response = jsonify(resultado)
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
 
 @views_bp.route('/impacto-real/<int:id>')
 def impacto_real(id):
     # Buscar dados do cenário
-    response = requests.get(f"{current_app.config['BACKEND_URL']}/api/cenarios/{id}")
-    if response.status_code != 200:
-        flash('Erro ao carregar o cenário.', 'error')
-        return redirect(url_for('views.dashboard'))
-    
-    cenario = response.json()
-    
-    # Calcular impactos reais baseados nos créditos totais
-    total_creditos = cenario.get('total_creditos', 0)
-    
-    impacto_real = {
-        'transporte': {
-            'impactos': [
-                {
-                    'nome': 'Carros por Ano',
-                    'valor': total_creditos * 0.5,  # 1 carro emite ~2 tCO2e/ano
-                    'unidade': 'carros'
-                },
-                {
-                    'nome': 'Quilômetros Evitados',
-                    'valor': total_creditos * 5000,  # ~200g CO2e/km
-                    'unidade': 'km'
-                },
-                {
-                    'nome': 'Voos SP-RJ',
-                    'valor': total_creditos * 5,  # ~0.2 tCO2e/voo
-                    'unidade': 'voos'
-                }
-            ]
-        },
-        'energia': {
-            'impactos': [
-                {
-                    'nome': 'Residências/Ano',
-                    'valor': total_creditos * 0.25,  # ~4 tCO2e/residência/ano
-                    'unidade': 'casas'
-                },
-                {
-                    'nome': 'Smartphones Carregados',
-                    'valor': total_creditos * 100000,  # ~10g CO2e/carga
-                    'unidade': 'cargas'
-                },
-                {
-                    'nome': 'Lâmpadas LED',
-                    'valor': total_creditos * 200,  # ~5kg CO2e economizado/lâmpada/ano
-                    'unidade': 'lâmpadas'
-                }
-            ]
-        },
-        'natureza': {
-            'impactos': [
-                {
-                    'nome': 'Árvores por 10 Anos',
-                    'valor': total_creditos * 90,  # ~11kg CO2e/árvore/ano
-                    'unidade': 'árvores'
-                },
-                {
-                    'nome': 'Hectares Preservados',
-                    'valor': total_creditos * 0.2,  # ~5 tCO2e/ha/ano
-                    'unidade': 'hectares'
-                },
-                {
-                    'nome': 'Área Preservada',
-                    'valor': total_creditos * 2000,  # ~0.5kg CO2e/m²/ano
-                    'unidade': 'm²'
-                }
-            ]
-        },
-        'consumo': {
-            'impactos': [
-                {
-                    'nome': 'Refeições Vegetarianas',
-                    'valor': total_creditos * 800,  # ~1.25kg CO2e/refeição com carne
-                    'unidade': 'refeições'
-                },
-                {
-                    'nome': 'Garrafas Plásticas',
-                    'valor': total_creditos * 4000,  # ~0.25kg CO2e/garrafa
-                    'unidade': 'garrafas'
-                },
-                {
-                    'nome': 'Camisetas de Algodão',
-                    'valor': total_creditos * 400,  # ~2.5kg CO2e/camiseta
-                    'unidade': 'camisetas'
-                }
-            ]
-        }
-    }
-    
-    return render_template('impacto_real.html', cenario=cenario, impacto_real=impacto_real)
+    return _renderizar_impacto(buscar_cenario(id))
+
+def _renderizar_impacto(cenario):
+    equivalencias = get_equivalencias()
+    impacto = _impactos(cenario) if cenario is not None else None
+    return _renderizar_cenario('impacto_real.html', cenario, versao=equivalencias.versao,
+                               impacto_real=impacto)
+
+def _impactos(cenario):
+    # Impactos reais baseados nos créditos totais, memorizados por valor
+    return get_equivalencias().impactos(cenario.get('total_creditos', 0))
 
 @views_bp.route('/apagar-cenario/<int:id>', methods=['POST'])
 def apagar_cenario(id):
     try:
-        response = requests.delete(f"{current_app.config['BACKEND_URL']}/api/cenarios/{id}")
-        if response.status_code == 200:
-            flash('Cenário excluído com sucesso!', 'success')
-        else:
-            flash('Erro ao excluir o cenário.', 'error')
+        response = get_backend().delete(f"/api/cenarios/{id}")
     except Exception as e:
-        flash(f'Erro ao excluir o cenário: {str(e)}', 'error')
+        return _concluir_exclusao(id, erro=e)
+    return _concluir_exclusao(id, response=response)
+
+def _concluir_exclusao(id, response=None, erro=None):
+    if erro is not None:
+        get_cenario_cache().invalidar_cenario(id)
+        flash(f'Erro ao excluir o cenário: {str(erro)}', 'error')
+    elif response.status_code == 200:
+        registrar_exclusao(id)
+        flash('Cenário excluído com sucesso!', 'success')
+    else:
+        get_cenario_cache().invalidar_cenario(id)
+        flash('Erro ao excluir o cenário.', 'error')
     
     return redirect(url_for('views.dashboard'))
 
 @views_bp.route('/apagar-todos-cenarios', methods=['POST'])
 def apagar_todos_cenarios():
+    # Em segundo plano o navegador acompanha o progresso pelo dashboard
+    if current_app.config['BULK_DELETE_BACKGROUND']:
+        return _iniciar_exclusao_todos()
+    
     try:
-        # Buscar todos os cenários
-        response = requests.get(f"{current_app.config['BACKEND_URL']}/api/cenarios")
-        if response.status_code == 200:
-            cenarios = response.json()
-            # Excluir cada cenário
-            for cenario in cenarios:
-                requests.delete(f"{current_app.config['BACKEND_URL']}/api/cenarios/{cenario['id']}")
-            flash('Todos os cenários foram excluídos com sucesso!', 'success')
-        else:
-            flash('Erro ao buscar os cenários.', 'error')
+        resultado = excluir_todos_cenarios()
     except Exception as e:
-        flash(f'Erro ao excluir os cenários: {str(e)}', 'error')
+        resultado = e
+    return _concluir_exclusao_todos(resultado)
+
+def _iniciar_exclusao_todos():
+    tarefa = get_tarefas().iniciar('exclusao', excluir_todos_cenarios)
+    flash('Exclusão dos cenários iniciada.', 'info')
+    return redirect(url_for('views.dashboard', tarefa=tarefa.id))
+
+def _concluir_exclusao_todos(resultado):
+    if isinstance(resultado, Exception):
+        flash(f'Erro ao excluir os cenários: {str(resultado)}', 'error')
+    elif resultado['falhas']:
+        flash(f'{len(resultado["excluidos"])} cenário(s) excluído(s); '
+              f'{len(resultado["falhas"])} não puderam ser excluídos.', 'error')
+    else:
+        flash('Todos os cenários foram excluídos com sucesso!', 'success')
     
     return redirect(url_for('views.dashboard'))
 
+@views_bp.route('/tarefas/<tarefa_id>')
+def status_tarefa(tarefa_id):
+    """Progresso de uma tarefa em segundo plano"""
+    tarefa = get_tarefas().obter(tarefa_id)
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    return jsonify(tarefa)
+
+@views_bp.route('/metrics')
+def metricas():
+    """Métricas das requisições, do backend e dos caches para o Prometheus"""
+    return current_app.response_class(get_metricas().exportar(),
+                                      content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@views_bp.route('/api/cache')
+def estatisticas_cache():
+    """Métricas de acertos/falhas do cache de cenários"""
+    return jsonify(get_cenario_cache().estatisticas())
+
+@views_bp.route('/api/cache/calculo')
+def estatisticas_cache_calculo():
+    """Métricas do cache de resultados de /api/calcular"""
+    return jsonify(get_cache_calculo().estatisticas())
+
+@views_bp.route('/api/impacto')
+def impacto_portfolio():
+    """Impactos reais do portfólio e de cada cenário.
+
+    Aceita os filtros do dashboard (``localizacao``, ``metodologia``) e uma
+    seleção de ``ids``.
+    """
+    cenarios = buscar_cenarios()
+    if cenarios is None:
+        return jsonify({'erro': 'Erro ao carregar os cenários'}), 502
+    cenarios = filtrar_e_ordenar(cenarios, ParametrosListagem.from_args(request.args))
+    ids = set(_ids_lote(request.args))
+    if ids:
+        cenarios = [cenario for cenario in cenarios if cenario.get('id') in ids]
+    return jsonify(get_equivalencias().portfolio(cenarios))
+
+def _responder_pdf(tipo, id):
+    """Entrega o PDF em cache ou acompanha a sua geração em segundo plano"""
+    cenario = buscar_cenario(id)
+    if cenario is None:
+        flash('Erro ao buscar dados do cenário', 'error')
+        return redirect(url_for('views.dashboard'))
+    
+    # O navegador já tem a versão atual: nem renderiza nem busca no cache
+    cache = get_pdf_cache()
+    chave = cache.chave(tipo, id, cenario)
+    if request.if_none_match.contains_weak(chave):
+        # 304 direto: com o corpo vazio um Range no mesmo pedido viraria 416
+        response = current_app.response_class(status=304)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.set_etag(chave)
+        return response
+    
+    chave, conteudo, tarefa = cache.solicitar(tipo, id, cenario)
+    if conteudo is None:
+        # Relatórios rápidos ainda são entregues na mesma requisição
+        try:
+            with medir('pdf'):
+                tarefa.futuro.result(timeout=current_app.config['PDF_ESPERA_MAXIMA'])
+        except FuturesTimeoutError:
+            return render_template('aguardando_pdf.html',
+                                   tarefa_id=tarefa.id,
+                                   download_url=url_for('views.baixar_pdf', chave=chave))
+        if tarefa.status == 'falhou':
+            flash(f'Erro ao gerar PDF: {tarefa.erro}', 'error')
+            return redirect(url_for('views.dashboard'))
+        conteudo = cache.obter(chave) or cache.gerar(tipo, cenario, chave)
+    
+    return _enviar_pdf(tipo, id, chave, conteudo)
+
+def _enviar_pdf(tipo, id, chave, conteudo):
+    """Resposta em memória com ETag; 304 e Range são tratados pelo Werkzeug"""
+    if tipo == 'creditos':
+        download_name = f'relatorio_creditos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+    else:
+        download_name = f'cenario_{id}.pdf'
+    response = current_app.response_class(conteudo, mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(chave)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(conteudo))
+
 @views_bp.route('/exportar-pdf/creditos/<int:id>')
 def exportar_pdf_creditos(id):
     """Exporta relatório de créditos de carbono em PDF"""
     try:
-        # Buscar dados do cenário
-        response = requests.get(f"{current_app.config['BACKEND_URL']}/api/cenarios/{id}")
-        if response.status_code != 200:
-            flash('Erro ao buscar dados do cenário', 'error')
-            return redirect(url_for('views.dashboard'))
-            
-        cenario = response.json()
-        
-        # Criar um arquivo temporário para o PDF
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
-            # Renderizar o template para PDF
-            html = render_template('pdf/relatorio_creditos.html', 
-                                 cenario=cenario,
-                                 data_geracao=datetime.now().strftime('%d/%m/%Y às %H:%M'))
-            
-            # Configurar opções do PDF
-            options = {
-                'page-size': 'A4',
-                'margin-top': '0.75in',
-                'margin-right': '0.75in',
-                'margin-bottom': '0.75in',
-                'margin-left': '0.75in',
-                'encoding': 'UTF-8',
-                'no-outline': None
-            }
-            
-            # Gerar o PDF
-            pdfkit.from_string(html, tmp.name, options=options)
-            
-            # Enviar o arquivo
-            return send_file(tmp.name,
-                            mimetype='application/pdf',
-                            as_attachment=True,
-                            download_name=f'relatorio_creditos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
-                            
+        return _responder_pdf('creditos', id)
     except Exception as e:
         flash(f'Erro ao gerar PDF: {str(e)}', 'error')
         return redirect(url_for('views.dashboard'))
@@ -426,67 +465,78 @@ def exportar_pdf_creditos(id):
 def gerar_pdf(id):
     """Gera um PDF com os detalhes do cenário"""
     try:
-        # Buscar dados do cenário
-        response = requests.get(f"{current_app.config['BACKEND_URL']}/api/cenarios/{id}")
-        if response.status_code != 200:
-            flash('Erro ao buscar dados do cenário', 'error')
+        return _responder_pdf('cenario', id)
+    except Exception as e:
+        flash(f'Erro ao gerar PDF: {str(e)}', 'error')
+        return redirect(url_for('views.dashboard'))
+
+def _ids_lote(valores):
+    """Ids pedidos em ``ids`` (repetido ou separado por vírgulas) ou todos os que casam com o filtro"""
+    if valores.get('todos'):
+        cenarios = buscar_cenarios() or []
+        parametros = ParametrosListagem.from_args(valores)
+        return [cenario['id'] for cenario in filtrar_e_ordenar(cenarios, parametros)]
+    ids = []
+    for valor in valores.getlist('ids'):
+        ids.extend(int(id) for id in valor.split(',') if id.strip().isdigit())
+    return list(dict.fromkeys(ids))
+
+@views_bp.route('/exportar-pdf/lote', methods=['GET', 'POST'])
+def exportar_pdf_lote():
+    """Exporta os relatórios de vários cenários em um ZIP ou em um PDF consolidado"""
+    try:
+        exportador = get_exportador()
+        ids = _ids_lote(request.values)
+        if not ids:
+            flash('Nenhum cenário selecionado para exportação.', 'error')
+            return redirect(url_for('views.dashboard'))
+        if len(ids) > exportador.max_cenarios:
+            flash(f'Selecione no máximo {exportador.max_cenarios} cenários por exportação.', 'error')
             return redirect(url_for('views.dashboard'))
-            
-        cenario = response.json()
-        
-        # Criar o PDF
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Configurar fonte
-        pdf.set_font('Arial', 'B', 16)
-        
-        # Título
-        pdf.cell(0, 10, f'Relatório de Créditos de Carbono - {cenario["nome_cenario"]}', ln=True, align='C')
-        pdf.ln(10)
-        
-        # Informações do cenário
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, 'Informações do Cenário:', ln=True)
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(0, 10, f'Localização: {cenario["localizacao"]}', ln=True)
-        pdf.cell(0, 10, f'Área Total: {cenario["area_total"]} hectares', ln=True)
-        pdf.cell(0, 10, f'Total de Créditos: {cenario["total_creditos"]} tCO₂e', ln=True)
-        pdf.cell(0, 10, f'Valor Estimado: R$ {cenario["valor_estimado"]:,.2f}', ln=True)
-        pdf.ln(10)
-        
-        # Metodologias
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, 'Metodologias:', ln=True)
-        pdf.set_font('Arial', '', 12)
-        for metodologia in cenario['metodologias']:
-            pdf.cell(0, 10, f'• {metodologia}', ln=True)
-        pdf.ln(10)
-        
-        # Resultados por metodologia
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, 'Resultados por Metodologia:', ln=True)
-        pdf.set_font('Arial', '', 12)
-        for metodologia, resultado in cenario['resultados'].items():
-            if resultado:
-                pdf.cell(0, 10, f'{metodologia.title()}:', ln=True)
-                pdf.cell(0, 10, f'  Créditos: {resultado["creditos"]} tCO₂e', ln=True)
-                pdf.cell(0, 10, f'  Valor: R$ {resultado["valor"]:,.2f}', ln=True)
-                pdf.ln(5)
         
-        # Salvar o PDF
-        pdf_path = os.path.join(current_app.static_folder, 'pdfs', f'cenario_{id}.pdf')
-        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
-        pdf.output(pdf_path)
+        cenarios, falhas = exportador.buscar(ids)
+        if not cenarios:
+            flash('Erro ao buscar dados dos cenários', 'error')
+            return redirect(url_for('views.dashboard'))
         
-        # Retornar o arquivo
-        return send_file(
-            pdf_path,
-            as_attachment=True,
-            download_name=f'cenario_{id}.pdf',
-            mimetype='application/pdf'
-        )
+        data = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if request.values.get('formato') == 'pdf':
+            response = current_app.response_class(exportador.gerar_pdf_consolidado(cenarios),
+                                                  mimetype='application/pdf')
+            response.headers['Content-Disposition'] = f'attachment; filename=portfolio_{data}.pdf'
+            return response
         
+        tipo = 'creditos' if request.values.get('tipo') == 'creditos' else 'cenario'
+        response = current_app.response_class(
+            stream_with_context(exportador.gerar_zip(cenarios, tipo=tipo, falhas=falhas)),
+            mimetype='application/zip')
+        response.headers['Content-Disposition'] = f'attachment; filename=relatorios_{data}.zip'
+        return response
+    
     except Exception as e:
-        flash(f'Erro ao gerar PDF: {str(e)}', 'error')
-        return redirect(url_for('views.dashboard')) 
\ No newline at end of file
+        flash(f'Erro ao exportar relatórios: {str(e)}', 'error')
+        return redirect(url_for('views.dashboard'))
+
+@views_bp.route('/pdfs/<chave>')
+def baixar_pdf(chave):
+    """Download de um PDF gerado em segundo plano"""
+    dados = CachePDF.interpretar_chave(chave)
+    if dados is None:
+        flash('PDF não encontrado.', 'error')
+        return redirect(url_for('views.dashboard'))
+    tipo, id = dados
+    
+    cache = get_pdf_cache()
+    conteudo = cache.obter(chave)
+    if conteudo is None:
+        # Gerado em outro worker ou já removido: renderiza aqui se o cenário não mudou
+        cenario = buscar_cenario(id)
+        if cenario is None or cache.chave(tipo, id, cenario) != chave:
+            flash('PDF não encontrado ou expirado.', 'error')
+            return redirect(url_for('views.dashboard'))
+        try:
+            conteudo = cache.gerar(tipo, cenario, chave)
+        except Exception as e:
+            flash(f'Erro ao gerar PDF: {str(e)}', 'error')
+            return redirect(url_for('views.dashboard'))
+    return _enviar_pdf(tipo, id, chave, conteudo)
@@ -0,0 +1,94 @@
+import httpx
+from flask import current_app, render_template, request
+
+from ..services.backend import CircuitoAberto
+from ..services.backend_async import get_backend_async
+from ..services.calculo import get_cache_calculo
+from ..services.cenarios_async import (buscar_cenario, buscar_dashboard, buscar_pagina,
+                                       excluir_todos_cenarios)
+from .views import (_concluir_calculo, _concluir_exclusao, _concluir_exclusao_todos,
+                    _dados_calculo, _exibir_resultados, _iniciar_exclusao_todos,
+                    _parametros_dashboard, _renderizar_cenario, _renderizar_creditos,
+                    _renderizar_dashboard, _renderizar_impacto, _responder_graficos, ERRO_BACKEND)
+
+# Versões async das rotas que dependem do backend. Substituem as do blueprint
+# quando ASYNC_VIEWS está ativo; a renderização é a mesma das views síncronas.
+
+
+async def dashboard():
+    dados = await buscar_dashboard(serie=False)
+    parametros = _parametros_dashboard()
+    return _renderizar_dashboard(dados, await buscar_pagina(parametros), parametros)
+
+
+async def graficos_dashboard():
+    return _responder_graficos(await buscar_dashboard())
+
+
+async def creditos():
+    if request.method == 'POST':
+        data = _dados_calculo()
+        if data is None:
+            return render_template('calculadora_creditos.html', error="Por favor, preencha pelo menos uma área.")
+
+        resultados = get_cache_calculo().obter(data)
+        if resultados is not None:
+            return _exibir_resultados(resultados)
+
+        try:
+            response = await get_backend_async().post("/api/calcular", json=data)
+        except (httpx.HTTPError, CircuitoAberto):
+            return render_template('calculadora_creditos.html', error=ERRO_BACKEND), 503
+        if response.status_code == 200:
+            resultados = response.json()
+            cenario_id = resultados.get('id') or resultados.get('cenario_id')
+            cenario = await buscar_cenario(cenario_id) if cenario_id else None
+            return _concluir_calculo(data, resultados, cenario)
+        return render_template('calculadora_creditos.html', error="Erro ao calcular créditos. Por favor, tente novamente.")
+
+    return _renderizar_creditos()
+
+
+async def detalhes_cenario(id):
+    return _renderizar_cenario('detalhes.html', await buscar_cenario(id))
+
+
+async def impacto_real(id):
+    return _renderizar_impacto(await buscar_cenario(id))
+
+
+async def apagar_cenario(id):
+    try:
+        response = await get_backend_async().delete(f"/api/cenarios/{id}")
+    except (httpx.HTTPError, CircuitoAberto) as e:
+        return _concluir_exclusao(id, erro=e)
+    return _concluir_exclusao(id, response=response)
+
+
+async def apagar_todos_cenarios():
+    # A tarefa em segundo plano continua nos pools do GerenciadorTarefas
+    if current_app.config['BULK_DELETE_BACKGROUND']:
+        return _iniciar_exclusao_todos()
+
+    try:
+        resultado = await excluir_todos_cenarios()
+    except Exception as e:
+        resultado = e
+    return _concluir_exclusao_todos(resultado)
+
+
+VIEWS = {
+    'views.dashboard': dashboard,
+    'views.graficos_dashboard': graficos_dashboard,
+    'views.creditos': creditos,
+    'views.detalhes_cenario': detalhes_cenario,
+    'views.impacto_real': impacto_real,
+    'views.apagar_cenario': apagar_cenario,
+    'views.apagar_todos_cenarios': apagar_todos_cenarios,
+}
+
+
+def registrar_views_async(app):
+    """Troca as views do blueprint pelas versões async"""
+    for endpoint, view in VIEWS.items():
+        app.view_functions[endpoint] = view
@@ -0,0 +1,83 @@
+from .agregados import AgregadosDashboard, dados_graficos, get_agregados, reduzir_serie
+from .backend import BackendClient, CircuitoAberto, get_backend
+from .calculo import CacheCalculo, get_cache_calculo
+from .calculo_lote import calcular_lote, caminho_resultado, formato_arquivo, guardar_envio
+from .cache import CenarioCache, SQLiteCache, TTLCache, get_cenario_cache
+from .compressao import comprimir
+from .degradacao import Revalidacao, dados_obsoletos, get_revalidacao
+from .equivalencias import Equivalencias, get_equivalencias
+from .estudos import CatalogoEstudos, get_catalogo_estudos
+from .exclusao import excluir_cenarios
+from .exportacao import ExportadorLote, get_exportador
+from .feed import FeedCenarios, get_feed
+from .fragmentos import CacheFragmentos, get_fragmentos
+from .metricas import Metricas, get_metricas, medir
+from .paginacao import Pagina, ParametrosListagem, filtrar_e_ordenar
+from .pdf import CachePDF, get_pdf_cache, hash_cenario
+from .resultados import ResultadosCalculo, get_resultados
+from .tarefas import GerenciadorTarefas, Tarefa, get_tarefas
+from .cenarios import (
+    buscar_cenario,
+    buscar_cenarios,
+    buscar_dashboard,
+    buscar_pagina,
+    excluir_todos_cenarios,
+    registrar_exclusao,
+    registrar_inclusao,
+)
+
+__all__ = [
+    'AgregadosDashboard',
+    'BackendClient',
+    'CacheCalculo',
+    'CacheFragmentos',
+    'CachePDF',
+    'CatalogoEstudos',
+    'CenarioCache',
+    'CircuitoAberto',
+    'Equivalencias',
+    'ExportadorLote',
+    'FeedCenarios',
+    'GerenciadorTarefas',
+    'Metricas',
+    'Pagina',
+    'ParametrosListagem',
+    'ResultadosCalculo',
+    'Revalidacao',
+    'SQLiteCache',
+    'TTLCache',
+    'Tarefa',
+    'buscar_cenario',
+    'buscar_cenarios',
+    'buscar_dashboard',
+    'buscar_pagina',
+    'calcular_lote',
+    'caminho_resultado',
+    'comprimir',
+    'dados_graficos',
+    'dados_obsoletos',
+    'excluir_cenarios',
+    'excluir_todos_cenarios',
+    'filtrar_e_ordenar',
+    'formato_arquivo',
+    'get_agregados',
+    'get_backend',
+    'get_cache_calculo',
+    'get_catalogo_estudos',
+    'get_cenario_cache',
+    'get_equivalencias',
+    'get_exportador',
+    'get_feed',
+    'get_fragmentos',
+    'get_metricas',
+    'get_pdf_cache',
+    'get_resultados',
+    'get_revalidacao',
+    'get_tarefas',
+    'guardar_envio',
+    'hash_cenario',
+    'medir',
+    'reduzir_serie',
+    'registrar_exclusao',
+    'registrar_inclusao',
+]
@@ -0,0 +1,179 @@
+import threading
+from itertools import accumulate
+
+from flask import current_app
+
+METODOLOGIAS = ('credito_pastagem', 'credito_florestal', 'credito_renovacao', 'credito_integracao')
+AREAS = ('area_pastagem', 'area_florestal', 'area_renovacao_cultura', 'area_integracao_lavoura')
+
+
+def _contribuicao(cenario):
+    """Valores de um cenário que entram nos totais do dashboard"""
+    return (
+        cenario.get('total_creditos', 0),
+        cenario.get('valor_estimado', 0),
+        sum(cenario.get(area, 0) for area in AREAS),
+        tuple(cenario.get(m, 0) for m in METODOLOGIAS),
+        cenario.get('data_calculo', ''),
+    )
+
+
+class AgregadosDashboard:
+    """Totais, distribuição por metodologia e série acumulada do dashboard.
+
+    Os totais são calculados em uma única passada sobre a lista e depois
+    mantidos incrementalmente a cada cenário adicionado ou removido; a série
+    acumulada só é remontada quando é lida depois de uma alteração.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.versao = None
+        self._zerar()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['agregados_dashboard'] = self
+
+    def _zerar(self):
+        self._itens = {}
+        self.total_creditos = 0
+        self.valor_estimado = 0
+        self.area_total = 0
+        self._totais = [0] * len(METODOLOGIAS)
+        self._serie = None
+
+    def recalcular(self, cenarios, versao=None):
+        with self._lock:
+            self._zerar()
+            for posicao, cenario in enumerate(cenarios):
+                self._somar(cenario.get('id', f'#{posicao}'), _contribuicao(cenario))
+            self.versao = versao
+
+    def adicionar(self, cenario, versao=None):
+        """Soma o cenário; se o id já estava nos totais, a versão anterior é substituída"""
+        with self._lock:
+            id = cenario.get('id', f'#{len(self._itens)}')
+            self._subtrair(id)
+            self._somar(id, _contribuicao(cenario))
+            self.versao = versao
+
+    def remover(self, id, versao=None):
+        with self._lock:
+            self._subtrair(id)
+            self.versao = versao
+
+    def _subtrair(self, id):
+        item = self._itens.pop(id, None)
+        if item is not None:
+            creditos, valor, area, metodologias, _ = item
+            self.total_creditos -= creditos
+            self.valor_estimado -= valor
+            self.area_total -= area
+            for i, credito in enumerate(metodologias):
+                self._totais[i] -= credito
+            self._serie = None
+
+    def _somar(self, id, item):
+        creditos, valor, area, metodologias, _ = item
+        self._itens[id] = item
+        self.total_creditos += creditos
+        self.valor_estimado += valor
+        self.area_total += area
+        for i, credito in enumerate(metodologias):
+            self._totais[i] += credito
+        self._serie = None
+
+    def _montar_serie(self):
+        if self._serie is None:
+            itens = self._itens.values()
+            datas = [item[4] for item in itens]
+            self._serie = (datas, list(accumulate(item[0] for item in itens)))
+        return self._serie
+
+    def _resumo(self):
+        return {
+            'total_cenarios': len(self._itens),
+            'total_creditos': self.total_creditos,
+            'valor_estimado': self.valor_estimado,
+            'area_total': self.area_total,
+            'totais': dict(zip(METODOLOGIAS, self._totais)),
+        }
+
+    def resumo(self):
+        """Totais e distribuição por metodologia, sem montar a série acumulada"""
+        with self._lock:
+            return self._resumo()
+
+    def to_dict(self):
+        """Variáveis consumidas pelo template dashboard.html"""
+        with self._lock:
+            datas, creditos_acumulados = self._montar_serie()
+            return dict(self._resumo(), datas=datas, creditos_acumulados=creditos_acumulados)
+
+
+def _agrupar_datas(datas, valores):
+    """Mantém só o último valor acumulado de cada sequência de cenários com a mesma data"""
+    agrupadas, acumulados = [], []
+    for data, valor in zip(datas, valores):
+        if agrupadas and agrupadas[-1] == data:
+            acumulados[-1] = valor
+        else:
+            agrupadas.append(data)
+            acumulados.append(valor)
+    return agrupadas, acumulados
+
+
+def reduzir_serie(datas, valores, maximo):
+    """Reduz a série a no máximo ``maximo`` pontos preservando o seu formato.
+
+    Usa o Largest-Triangle-Three-Buckets: o primeiro e o último ponto são
+    mantidos e, de cada balde intermediário, fica o ponto que forma o maior
+    triângulo com o ponto escolhido antes e a média do balde seguinte.
+    """
+    total = len(valores)
+    if total <= maximo:
+        return datas, valores
+    if maximo < 3:
+        indices = [0, total - 1][-maximo:] if maximo > 0 else []
+        return [datas[i] for i in indices], [valores[i] for i in indices]
+
+    tamanho = (total - 2) / (maximo - 2)
+    indices = [0]
+    anterior = 0
+    for balde in range(maximo - 2):
+        inicio = int(balde * tamanho) + 1
+        fim = int((balde + 1) * tamanho) + 1
+        proximo_fim = min(int((balde + 2) * tamanho) + 1, total)
+        media_x = (fim + proximo_fim - 1) / 2
+        media_y = sum(valores[fim:proximo_fim]) / (proximo_fim - fim)
+        x_anterior, y_anterior = anterior, valores[anterior]
+        anterior = max(range(inicio, fim), key=lambda i: abs(
+            (x_anterior - media_x) * (valores[i] - y_anterior) - (x_anterior - i) * (media_y - y_anterior)))
+        indices.append(anterior)
+    indices.append(total - 1)
+    return [datas[i] for i in indices], [valores[i] for i in indices]
+
+
+def dados_graficos(agregados, maximo_pontos):
+    """Dados dos gráficos do dashboard em colunas, com a série reduzida a ``maximo_pontos``"""
+    datas, acumulados = _agrupar_datas(agregados['datas'], agregados['creditos_acumulados'])
+    pontos = len(datas)
+    datas, acumulados = reduzir_serie(datas, acumulados, maximo_pontos)
+    return {
+        'total_cenarios': agregados['total_cenarios'],
+        'metodologias': {
+            'campos': list(METODOLOGIAS),
+            'creditos': [round(agregados['totais'][m], 2) for m in METODOLOGIAS],
+        },
+        'serie': {
+            'datas': datas,
+            'creditos_acumulados': [round(valor, 2) for valor in acumulados],
+            'pontos': pontos,
+        },
+    }
+
+
+def get_agregados():
+    return current_app.extensions['agregados_dashboard']
@@ -0,0 +1,250 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metricas import acumular
+
+# Segmentos numéricos viram <id> para agrupar as métricas por endpoint
+_ID_RE = re.compile(r'/\d+(?=/|$)')
+
+
+def normalizar_rota(method, path):
+    return f"{method.upper()} {_ID_RE.sub('/<id>', path.split('?', 1)[0])}"
+
+
+class CircuitoAberto(requests.ConnectionError):
+    """Chamada recusada sem contatar o backend: o circuito da rota está aberto"""
+
+    def __init__(self, rota):
+        super().__init__(f'Circuito aberto para {rota}')
+        self.rota = rota
+
+
+class Circuito:
+    """Disjuntor de um endpoint do backend.
+
+    Abre quando a fração de erros nas últimas ``janela`` chamadas passa de
+    ``limite_erros``; aberto, recusa as chamadas na hora. Depois de
+    ``tempo_aberto`` segundos libera uma única chamada de teste
+    (meio-aberto): se ela der certo o circuito fecha, senão volta a abrir.
+    """
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio_aberto'
+
+    def __init__(self, janela, min_chamadas, limite_erros, tempo_aberto):
+        self.resultados = deque(maxlen=janela)
+        self.min_chamadas = min_chamadas
+        self.limite_erros = limite_erros
+        self.tempo_aberto = tempo_aberto
+        self.estado = self.FECHADO
+        self.mudou_em = 0.0
+        self.aberturas = 0
+        self.recusadas = 0
+
+    def liberar(self, agora):
+        if self.estado == self.FECHADO:
+            return True
+        # A chamada de teste também é refeita se a anterior nunca terminou
+        if agora - self.mudou_em >= self.tempo_aberto:
+            self.estado = self.MEIO_ABERTO
+            self.mudou_em = agora
+            return True
+        self.recusadas += 1
+        return False
+
+    def registrar(self, erro, agora):
+        if self.estado == self.MEIO_ABERTO:
+            if erro:
+                self._abrir(agora)
+            else:
+                self.estado = self.FECHADO
+                self.resultados.clear()
+            return
+        if self.estado == self.ABERTO:
+            # Chamadas iniciadas antes da abertura não mudam o estado
+            return
+        self.resultados.append(erro)
+        if (len(self.resultados) >= self.min_chamadas
+                and sum(self.resultados) / len(self.resultados) >= self.limite_erros):
+            self._abrir(agora)
+
+    def _abrir(self, agora):
+        self.estado = self.ABERTO
+        self.mudou_em = agora
+        self.aberturas += 1
+        self.resultados.clear()
+
+    def to_dict(self):
+        return {'estado': self.estado, 'aberturas': self.aberturas, 'recusadas': self.recusadas}
+
+
+class EstatisticasEndpoint:
+    """Contadores de latência e erros de um endpoint do backend"""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.tempo_total = 0.0
+        self.tempo_maximo = 0.0
+        self.status = {}
+
+    def registrar(self, duracao, status=None, erro=False):
+        self.chamadas += 1
+        self.tempo_total += duracao
+        self.tempo_maximo = max(self.tempo_maximo, duracao)
+        if status is not None:
+            self.status[status] = self.status.get(status, 0) + 1
+        if erro:
+            self.erros += 1
+
+    def to_dict(self):
+        return {
+            'chamadas': self.chamadas,
+            'erros': self.erros,
+            'tempo_total': self.tempo_total,
+            'tempo_medio': self.tempo_total / self.chamadas if self.chamadas else 0.0,
+            'tempo_maximo': self.tempo_maximo,
+            'status': dict(self.status),
+        }
+
+
+class BackendClient:
+    """Cliente HTTP do backend com pool de conexões, timeouts e retentativas.
+
+    Cada worker do gunicorn mantém a sua própria Session: se o processo foi
+    criado por fork (``--preload``), a sessão herdada é descartada e recriada.
+    """
+
+    def __init__(self, app=None):
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._estatisticas = {}
+        self._circuitos = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.base_url = config['BACKEND_URL'].rstrip('/')
+        self.timeout = (config['BACKEND_CONNECT_TIMEOUT'], config['BACKEND_READ_TIMEOUT'])
+        self.pool_connections = config['BACKEND_POOL_CONNECTIONS']
+        self.pool_maxsize = config['BACKEND_POOL_MAXSIZE']
+        self.retries = config['BACKEND_RETRIES']
+        self.backoff_factor = config['BACKEND_BACKOFF_FACTOR']
+        self.circuito_ativo = config['CIRCUITO_ATIVO']
+        self.parametros_circuito = (config['CIRCUITO_JANELA'], config['CIRCUITO_MIN_CHAMADAS'],
+                                    config['CIRCUITO_LIMITE_ERROS'], config['CIRCUITO_TEMPO_ABERTO'])
+        app.extensions['backend'] = self
+
+    def _criar_session(self):
+        # Retentativas apenas para métodos idempotentes; POST nunca é repetido
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._criar_session()
+                    self._pid = pid
+                    self._estatisticas = {}
+                    self._circuitos = {}
+        return self._session
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        rota = normalizar_rota(method, path)
+        session = self.session
+        self.verificar_circuito(rota)
+        inicio = time.perf_counter()
+        try:
+            response = session.request(method, f"{self.base_url}{path}", **kwargs)
+        except requests.RequestException:
+            self.registrar(rota, time.perf_counter() - inicio, erro=True)
+            raise
+        finally:
+            acumular('backend', time.perf_counter() - inicio)
+        self.registrar(rota, time.perf_counter() - inicio,
+                        status=response.status_code,
+                        erro=response.status_code >= 500)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def _circuito(self, rota):
+        circuito = self._circuitos.get(rota)
+        if circuito is None:
+            circuito = self._circuitos[rota] = Circuito(*self.parametros_circuito)
+        return circuito
+
+    def verificar_circuito(self, rota):
+        """Levanta CircuitoAberto se as chamadas à rota estão sendo recusadas"""
+        if not self.circuito_ativo:
+            return
+        with self._lock:
+            liberada = self._circuito(rota).liberar(time.monotonic())
+        if not liberada:
+            raise CircuitoAberto(rota)
+
+    def registrar(self, rota, duracao, status=None, erro=False):
+        with self._lock:
+            estatisticas = self._estatisticas.get(rota)
+            if estatisticas is None:
+                estatisticas = self._estatisticas[rota] = EstatisticasEndpoint()
+            estatisticas.registrar(duracao, status=status, erro=erro)
+            if self.circuito_ativo:
+                self._circuito(rota).registrar(erro, time.monotonic())
+
+    def estatisticas(self):
+        with self._lock:
+            return {rota: e.to_dict() for rota, e in self._estatisticas.items()}
+
+    def circuitos(self):
+        """Estado do circuito de cada rota já chamada"""
+        with self._lock:
+            return {rota: c.to_dict() for rota, c in self._circuitos.items()}
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+def get_backend():
+    return current_app.extensions['backend']
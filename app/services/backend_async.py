@@ -0,0 +1,109 @@
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+from flask import current_app
+
+from .backend import normalizar_rota
+from .metricas import medir
+
+METODOS_IDEMPOTENTES = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'])
+STATUS_RETENTATIVA = frozenset([502, 503, 504])
+
+
+class AsyncBackendClient:
+    """Cliente HTTP assíncrono do backend, usado pelas views async.
+
+    O ``httpx.AsyncClient`` vive em um event loop próprio, numa thread do
+    worker, e é compartilhado por todas as requisições: as views apenas
+    aguardam o resultado, e as chamadas de todas as threads do worker são
+    multiplexadas no mesmo pool de conexões. As métricas e o circuito de cada
+    rota ficam no BackendClient síncrono, para que os dois caminhos apareçam
+    juntos.
+    """
+
+    def __init__(self, app=None):
+        self._loop = None
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.base_url = config['BACKEND_URL'].rstrip('/')
+        self.timeout = httpx.Timeout(config['BACKEND_READ_TIMEOUT'],
+                                     connect=config['BACKEND_CONNECT_TIMEOUT'])
+        self.limits = httpx.Limits(max_connections=config['BACKEND_POOL_MAXSIZE'],
+                                   max_keepalive_connections=config['BACKEND_POOL_MAXSIZE'])
+        self.retries = config['BACKEND_RETRIES']
+        self.backoff_factor = config['BACKEND_BACKOFF_FACTOR']
+        self.backend = app.extensions['backend']
+        app.extensions['backend_async'] = self
+
+    @property
+    def loop(self):
+        # Threads não sobrevivem ao fork: cada worker inicia o seu loop
+        pid = os.getpid()
+        if self._loop is None or self._pid != pid:
+            with self._lock:
+                if self._loop is None or self._pid != pid:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='backend-async', daemon=True).start()
+                    self._client = asyncio.run_coroutine_threadsafe(self._criar_cliente(), loop).result()
+                    self._loop = loop
+                    self._pid = pid
+        return self._loop
+
+    async def _criar_cliente(self):
+        return httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+
+    async def _request(self, method, path, **kwargs):
+        rota = normalizar_rota(method, path)
+        tentativas = self.retries if method.upper() in METODOS_IDEMPOTENTES else 0
+        # Como no cliente síncrono, a chamada é registrada uma vez, com o resultado
+        # da última tentativa e o tempo total das retentativas
+        inicio = time.perf_counter()
+        for tentativa in range(tentativas + 1):
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if tentativa == tentativas:
+                    self.backend.registrar(rota, time.perf_counter() - inicio, erro=True)
+                    raise
+            else:
+                if response.status_code not in STATUS_RETENTATIVA or tentativa == tentativas:
+                    self.backend.registrar(rota, time.perf_counter() - inicio,
+                                           status=response.status_code,
+                                           erro=response.status_code >= 500)
+                    return response
+            await asyncio.sleep(self.backoff_factor * (2 ** tentativa))
+
+    async def request(self, method, path, **kwargs):
+        # O circuito é o mesmo do cliente síncrono: recusa antes de ir ao event loop
+        self.backend.verificar_circuito(normalizar_rota(method, path))
+        futuro = asyncio.run_coroutine_threadsafe(self._request(method, path, **kwargs), self.loop)
+        with medir('backend'):
+            return await asyncio.wrap_future(futuro)
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request('DELETE', path, **kwargs)
+
+    def close(self):
+        if self._loop is not None and self._pid == os.getpid():
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+def get_backend_async():
+    return current_app.extensions['backend_async']
@@ -0,0 +1,315 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class EstatisticasCache:
+    """Contadores de acertos, falhas e remoções de um cache"""
+
+    def __init__(self):
+        self.acertos = 0
+        self.falhas = 0
+        self.expiradas = 0
+        self.removidas = 0
+        self.invalidacoes = 0
+
+    def to_dict(self):
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'expiradas': self.expiradas,
+            'removidas': self.removidas,
+            'invalidacoes': self.invalidacoes,
+            'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+        }
+
+
+class TTLCache:
+    """Cache LRU em memória com tempo de vida por entrada.
+
+    Os valores são devolvidos sem cópia: quem lê não deve alterá-los.
+    """
+
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = EstatisticasCache()
+
+    def get(self, chave, default=None):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.stats.falhas += 1
+                return default
+            valor, expira = item
+            if expira < time.monotonic():
+                del self._dados[chave]
+                self.stats.expiradas += 1
+                self.stats.falhas += 1
+                return default
+            self._dados.move_to_end(chave)
+            self.stats.acertos += 1
+            return valor
+
+    def set(self, chave, valor, ttl=None):
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._gravar(chave, valor, expira)
+
+    def atualizar(self, chave, funcao, ttl=None):
+        """Grava ``funcao(valor atual ou None)`` de forma atômica; um retorno None não grava nada"""
+        with self._lock:
+            agora = time.monotonic()
+            item = self._dados.get(chave)
+            valor = funcao(item[0] if item is not None and item[1] >= agora else None)
+            if valor is not None:
+                self._gravar(chave, valor, agora + (self.ttl if ttl is None else ttl))
+            return valor
+
+    def _gravar(self, chave, valor, expira):
+        self._dados[chave] = (valor, expira)
+        self._dados.move_to_end(chave)
+        while len(self._dados) > self.maxsize:
+            self._dados.popitem(last=False)
+            self.stats.removidas += 1
+
+    def delete(self, chave):
+        with self._lock:
+            if self._dados.pop(chave, None) is not None:
+                self.stats.invalidacoes += 1
+
+    def clear(self):
+        with self._lock:
+            self.stats.invalidacoes += len(self._dados)
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class SQLiteCache:
+    """Cache em arquivo SQLite compartilhado entre os workers do gunicorn.
+
+    Os valores são serializados em JSON; a política de remoção descarta as
+    entradas mais próximas de expirar quando o limite é ultrapassado.
+    """
+
+    def __init__(self, caminho, maxsize=512, ttl=30):
+        self.caminho = caminho
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self.stats = EstatisticasCache()
+        with self._conexao() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(chave TEXT PRIMARY KEY, valor TEXT NOT NULL, expira REAL NOT NULL)'
+            )
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo (não reutilizar após fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, chave, default=None):
+        row = self._conexao().execute(
+            'SELECT valor, expira FROM cache WHERE chave = ?', (chave,)
+        ).fetchone()
+        if row is None:
+            self.stats.falhas += 1
+            return default
+        valor, expira = row
+        if expira < time.time():
+            self._conexao().execute('DELETE FROM cache WHERE chave = ?', (chave,))
+            self.stats.expiradas += 1
+            self.stats.falhas += 1
+            return default
+        self.stats.acertos += 1
+        return json.loads(valor)
+
+    def set(self, chave, valor, ttl=None):
+        self._gravar(self._conexao(), chave, valor, time.time() + (self.ttl if ttl is None else ttl))
+
+    def atualizar(self, chave, funcao, ttl=None):
+        """Grava ``funcao(valor atual ou None)`` de forma atômica; um retorno None não grava nada.
+
+        A transação ``IMMEDIATE`` bloqueia a escrita dos outros workers
+        entre a leitura e a gravação.
+        """
+        conn = self._conexao()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            agora = time.time()
+            row = conn.execute('SELECT valor, expira FROM cache WHERE chave = ?', (chave,)).fetchone()
+            valor = funcao(json.loads(row[0]) if row is not None and row[1] >= agora else None)
+            if valor is not None:
+                self._gravar(conn, chave, valor, agora + (self.ttl if ttl is None else ttl))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return valor
+
+    def _gravar(self, conn, chave, valor, expira):
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (chave, valor, expira) VALUES (?, ?, ?)',
+            (chave, json.dumps(valor), expira),
+        )
+        excesso = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.maxsize
+        if excesso > 0:
+            conn.execute(
+                'DELETE FROM cache WHERE chave IN '
+                '(SELECT chave FROM cache ORDER BY expira LIMIT ?)', (excesso,)
+            )
+            self.stats.removidas += excesso
+
+    def delete(self, chave):
+        cursor = self._conexao().execute('DELETE FROM cache WHERE chave = ?', (chave,))
+        self.stats.invalidacoes += cursor.rowcount
+
+    def clear(self):
+        cursor = self._conexao().execute('DELETE FROM cache')
+        self.stats.invalidacoes += cursor.rowcount
+
+    def __len__(self):
+        return self._conexao().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+def criar_cache(config, prefixo='CACHE'):
+    """Cria o armazenamento configurado em ``<prefixo>_BACKEND`` (memory ou sqlite)"""
+    tipo = config[f'{prefixo}_BACKEND']
+    maxsize = config[f'{prefixo}_MAXSIZE']
+    ttl = config[f'{prefixo}_TTL']
+    if tipo == 'sqlite':
+        return SQLiteCache(config[f'{prefixo}_SQLITE_PATH'], maxsize=maxsize, ttl=ttl)
+    if tipo == 'memory':
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    raise ValueError(f'{prefixo}_BACKEND inválido: {tipo}')
+
+
+class CenarioCache:
+    """Cache das respostas de ``/api/cenarios`` e ``/api/cenarios/<id>``.
+
+    Cada gravação também vai para a reserva (``CACHE_RESERVA_*``), que
+    guarda a última versão boa por muito mais tempo e é lida apenas com o
+    backend fora do ar.
+    """
+
+    CHAVE_LISTA = 'cenarios'
+
+    def __init__(self, app=None):
+        self.store = None
+        self.reserva = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = criar_cache(app.config)
+        self.reserva = criar_cache(app.config, 'CACHE_RESERVA')
+        app.extensions['cenario_cache'] = self
+
+    @staticmethod
+    def chave_cenario(id):
+        return f'cenario:{id}'
+
+    def obter_lista(self):
+        entrada = self.obter_lista_versionada()
+        return None if entrada is None else entrada[1]
+
+    def obter_lista_versionada(self):
+        """Retorna ``(versao, cenarios)`` ou None; a versão muda a cada gravação"""
+        entrada = self.store.get(self.CHAVE_LISTA)
+        if entrada is None:
+            return None
+        return entrada['versao'], entrada['cenarios']
+
+    def alterar_lista(self, alterar):
+        """Grava ``alterar(cenarios)`` como nova versão da lista em cache.
+
+        A leitura e a gravação são atômicas (também entre workers, com
+        sqlite): duas alterações simultâneas não se sobrescrevem. Retorna
+        ``(versao_lida, nova_versao)``, ou None se não havia lista em cache.
+        """
+        versoes = []
+
+        def nova_entrada(entrada):
+            if entrada is None:
+                return None
+            versoes[:] = [entrada['versao'], uuid.uuid4().hex]
+            return {'versao': versoes[1], 'cenarios': alterar(entrada['cenarios'])}
+
+        entrada = self.store.atualizar(self.CHAVE_LISTA, nova_entrada)
+        if entrada is None:
+            return None
+        self.reserva.set(self.CHAVE_LISTA, dict(entrada, guardado_em=time.time()))
+        return tuple(versoes)
+
+    def guardar_lista(self, cenarios):
+        versao = uuid.uuid4().hex
+        self.store.set(self.CHAVE_LISTA, {'versao': versao, 'cenarios': cenarios})
+        self.reserva.set(self.CHAVE_LISTA, {'versao': versao, 'cenarios': cenarios, 'guardado_em': time.time()})
+        return versao
+
+    def obter_cenario(self, id):
+        return self.store.get(self.chave_cenario(id))
+
+    def guardar_cenario(self, id, cenario):
+        self.store.set(self.chave_cenario(id), cenario)
+        self.reserva.set(self.chave_cenario(id), {'cenario': cenario, 'guardado_em': time.time()})
+
+    def obter_reserva_lista(self):
+        """Retorna ``(versao, cenarios, guardado_em)`` da última lista obtida, ou None"""
+        entrada = self.reserva.get(self.CHAVE_LISTA)
+        if entrada is None:
+            return None
+        return entrada['versao'], entrada['cenarios'], entrada['guardado_em']
+
+    def obter_reserva_cenario(self, id):
+        """Retorna ``(cenario, guardado_em)`` da última versão obtida do cenário, ou None"""
+        entrada = self.reserva.get(self.chave_cenario(id))
+        if entrada is None:
+            return None
+        return entrada['cenario'], entrada['guardado_em']
+
+    def invalidar_cenario(self, id, lista=True):
+        """Remove o cenário e, por padrão, a lista, que também o contém.
+
+        Da reserva sai só o cenário: a lista antiga continua sendo a última boa.
+        """
+        self.store.delete(self.chave_cenario(id))
+        self.reserva.delete(self.chave_cenario(id))
+        if lista:
+            self.store.delete(self.CHAVE_LISTA)
+
+    def invalidar_lista(self):
+        self.store.delete(self.CHAVE_LISTA)
+
+    def invalidar_tudo(self):
+        self.store.clear()
+        self.reserva.clear()
+
+    def estatisticas(self):
+        dados = self.store.stats.to_dict()
+        dados['entradas'] = len(self.store)
+        dados['backend'] = type(self.store).__name__
+        dados['reserva'] = dict(self.reserva.stats.to_dict(), entradas=len(self.reserva))
+        return dados
+
+
+def get_cenario_cache():
+    return current_app.extensions['cenario_cache']
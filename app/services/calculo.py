@@ -0,0 +1,103 @@
+from flask import current_app
+
+from .cache import criar_cache
+
+# Componente de /api/calcular ('resultados') -> campo de área correspondente
+COMPONENTES = {
+    'pastagem': 'area_pastagem',
+    'florestal': 'area_florestal',
+    'renovacao': 'area_renovacao_cultura',
+    'integracao': 'area_integracao_lavoura',
+}
+
+
+class CacheCalculo:
+    """Cache dos resultados de ``/api/calcular`` por combinação de áreas.
+
+    A chave é a tupla normalizada das quatro áreas mais a versão das
+    metodologias (``CALCULO_VERSAO``), de modo que uma mudança no backend
+    invalida tudo só trocando a versão. Cada metodologia do resultado
+    também é guardada à parte, para o modo "e se" da calculadora.
+
+    O resultado aponta para o cenário criado pelo backend; um índice por
+    cenário permite descartá-lo quando o cenário é excluído.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = criar_cache(app.config, 'CALCULO')
+        self.versao = app.config['CALCULO_VERSAO']
+        self.precisao = app.config['CALCULO_PRECISAO']
+        app.extensions['cache_calculo'] = self
+
+    def normalizar(self, area):
+        # round() pode devolver -0.0, que geraria uma chave diferente de 0.0
+        return round(float(area or 0), self.precisao) + 0.0
+
+    def chave(self, dados):
+        areas = ':'.join(repr(self.normalizar(dados.get(campo))) for campo in COMPONENTES.values())
+        return f'calculo:{self.versao}:{areas}'
+
+    def chave_componente(self, componente, area):
+        return f'componente:{self.versao}:{componente}:{self.normalizar(area)!r}'
+
+    def chave_cenario(self, id):
+        return f'cenario:{self.versao}:{id}'
+
+    @staticmethod
+    def cenario_id(resultados):
+        return resultados.get('id') or resultados.get('cenario_id')
+
+    def obter(self, dados):
+        resultados = self.store.get(self.chave(dados))
+        if resultados is None:
+            return None
+        id = self.cenario_id(resultados)
+        # Sem o índice (cenário excluído ou índice removido) o cenário pode não existir mais
+        if id is not None and self.store.get(self.chave_cenario(id)) is None:
+            return None
+        return resultados
+
+    def guardar(self, dados, resultados):
+        chave = self.chave(dados)
+        self.store.set(chave, resultados)
+        id = self.cenario_id(resultados)
+        if id is not None:
+            self.store.set(self.chave_cenario(id), chave)
+        for componente, valores in (resultados.get('resultados') or {}).items():
+            campo = COMPONENTES.get(componente)
+            if campo is not None and isinstance(valores, dict):
+                self.store.set(self.chave_componente(componente, dados.get(campo)), valores)
+
+    def obter_componente(self, componente, area):
+        """Resultado de uma metodologia para a área, ou None se ainda não calculado"""
+        if componente not in COMPONENTES:
+            return None
+        if self.normalizar(area) == 0:
+            return {'area': 0, 'creditos': 0, 'valor': 0}
+        return self.store.get(self.chave_componente(componente, area))
+
+    def invalidar_cenario(self, id):
+        """Descarta o resultado que aponta para o cenário excluído"""
+        chave = self.store.get(self.chave_cenario(id))
+        if chave is not None:
+            self.store.delete(chave)
+            self.store.delete(self.chave_cenario(id))
+
+    def invalidar_tudo(self):
+        self.store.clear()
+
+    def estatisticas(self):
+        dados = self.store.stats.to_dict()
+        dados['entradas'] = len(self.store)
+        dados['backend'] = type(self.store).__name__
+        dados['versao'] = self.versao
+        return dados
+
+
+def get_cache_calculo():
+    return current_app.extensions['cache_calculo']
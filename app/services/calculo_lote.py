@@ -0,0 +1,347 @@
+import csv
+import json
+import math
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
+
+import requests
+from flask import current_app
+
+from .agregados import AREAS
+from .backend import get_backend
+from .cache import get_cenario_cache
+from .feed import get_feed
+from .tarefas import get_tarefas
+
+FORMATOS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'json', '.ndjson': 'json'}
+CAMPOS_RESULTADO = ('linha', 'nome_cenario') + AREAS + ('id', 'total_creditos', 'valor_estimado', 'erro')
+_SEPARADORES_JSON = ' \t\r\n,[]'
+# Um registro JSON maior que isso interrompe a leitura do arquivo
+REGISTRO_JSON_MAXIMO = 1024 * 1024
+
+# URLs de backend que responderam não ter o endpoint de cálculo em lote
+lote_indisponivel = set()
+
+
+def formato_arquivo(nome):
+    """'csv' ou 'json' conforme a extensão do arquivo; None se não suportado"""
+    return FORMATOS.get(os.path.splitext(nome or '')[1].lower())
+
+
+def ler_propriedades(caminho, formato):
+    """Gera ``(linha, registro)`` lendo o arquivo um registro por vez.
+
+    JSON é aceito tanto como lista de objetos quanto como um objeto por
+    linha; um registro que não pode ser interpretado vem como None e a
+    leitura continua no registro seguinte.
+    """
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        if formato == 'csv':
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+            except csv.Error:
+                dialeto = csv.excel
+            for linha, registro in enumerate(csv.DictReader(arquivo, dialect=dialeto), start=2):
+                yield linha, registro
+        else:
+            yield from enumerate(_registros_json(arquivo), start=1)
+
+
+def _fim_do_registro(texto, fim):
+    """Posição logo após o registro no início de ``texto``; None se ele ainda não terminou.
+
+    Usado quando o registro não pôde ser interpretado: o fim é o fechamento
+    do objeto (ignorando o conteúdo das strings) ou, se uma string chega à
+    quebra de linha sem fechar, a própria quebra de linha.
+    """
+    if texto[0] not in '{[':
+        for posicao, caractere in enumerate(texto):
+            if caractere in _SEPARADORES_JSON or caractere == '{':
+                return posicao
+        return len(texto) if fim else None
+    profundidade = 0
+    em_string = escape = False
+    for posicao, caractere in enumerate(texto):
+        if em_string:
+            if escape:
+                escape = False
+            elif caractere == '\\':
+                escape = True
+            elif caractere == '"':
+                em_string = False
+            elif caractere == '\n':
+                return posicao
+        elif caractere == '"':
+            em_string = True
+        elif caractere in '{[':
+            profundidade += 1
+        elif caractere in '}]':
+            profundidade -= 1
+            if profundidade == 0:
+                return posicao + 1
+    return len(texto) if fim else None
+
+
+def _registros_json(arquivo, bloco=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    fim = False
+    while True:
+        buffer = buffer.lstrip(_SEPARADORES_JSON)
+        if buffer:
+            try:
+                registro, posicao = decoder.raw_decode(buffer)
+            except ValueError:
+                posicao = _fim_do_registro(buffer, fim)
+                if posicao is not None:
+                    # Registro malformado: é rejeitado e a leitura segue a partir do próximo
+                    buffer = buffer[posicao:]
+                    yield None
+                    continue
+                if len(buffer) > REGISTRO_JSON_MAXIMO:
+                    raise ValueError(f'Registro JSON com mais de {REGISTRO_JSON_MAXIMO} caracteres; '
+                                     'verifique se o arquivo está bem formado')
+            else:
+                buffer = buffer[posicao:]
+                yield registro
+                continue
+        elif fim:
+            return
+        pedaco = arquivo.read(bloco)
+        fim = not pedaco
+        buffer += pedaco
+
+
+def _numero(valor):
+    if valor is None or valor == '':
+        return 0.0
+    if isinstance(valor, str):
+        valor = valor.strip()
+        # Aceita vírgula decimal (planilhas em português)
+        if ',' in valor and '.' not in valor:
+            valor = valor.replace(',', '.')
+    numero = float(valor)
+    if not math.isfinite(numero):
+        # float() aceita 'nan', 'inf' e '1e400', que não viram JSON válido para o backend
+        raise ValueError(f'número inválido: {valor}')
+    return numero
+
+
+def validar_propriedade(registro):
+    """Retorna ``(dados, erro)``: os dados para /api/calcular ou o motivo da rejeição"""
+    if not isinstance(registro, dict):
+        return None, 'registro inválido'
+    dados = {}
+    for area in AREAS:
+        try:
+            dados[area] = _numero(registro.get(area))
+        except (TypeError, ValueError):
+            return None, f'{area} inválida'
+        if dados[area] < 0:
+            return None, f'{area} negativa'
+    if not any(dados.values()):
+        return None, 'nenhuma área preenchida'
+    return dados, None
+
+
+def _calcular_um(backend, dados):
+    try:
+        response = backend.post("/api/calcular", json=dados)
+    except requests.RequestException as e:
+        return None, str(e)
+    if response.status_code != 200:
+        return None, f'HTTP {response.status_code}'
+    return response.json(), None
+
+
+def _calcular_em_lote(backend, grupo):
+    """Usa ``POST /api/calcular-lote`` se o backend oferecer.
+
+    Retorna None quando o endpoint não existe, para cair no modo individual.
+    """
+    try:
+        response = backend.post("/api/calcular-lote", json={'propriedades': grupo})
+    except requests.RequestException as e:
+        return [(None, str(e))] * len(grupo)
+    if response.status_code in (404, 405, 501):
+        return None
+    if response.status_code != 200:
+        return [(None, f'HTTP {response.status_code}')] * len(grupo)
+    resultados = response.json().get('resultados', [])
+    respostas = []
+    for posicao in range(len(grupo)):
+        resultado = resultados[posicao] if posicao < len(resultados) else None
+        if not isinstance(resultado, dict):
+            respostas.append((None, 'não confirmado pelo backend'))
+        elif resultado.get('erro'):
+            respostas.append((None, str(resultado['erro'])))
+        else:
+            respostas.append((resultado, None))
+    return respostas
+
+
+def _calcular_grupo(backend, grupo, usar_lote):
+    if usar_lote:
+        respostas = _calcular_em_lote(backend, grupo)
+        if respostas is not None:
+            return respostas
+        lote_indisponivel.add(backend.base_url)
+    return [_calcular_um(backend, dados) for dados in grupo]
+
+
+def _validar(propriedades):
+    for linha, registro in propriedades:
+        dados, erro = validar_propriedade(registro)
+        yield linha, registro, dados, erro
+
+
+def _combinar(grupo, respostas):
+    """Associa as respostas do backend às linhas válidas do grupo"""
+    respostas = iter(respostas)
+    for linha, registro, dados, erro in grupo:
+        resultado = None
+        if erro is None:
+            resultado, erro = next(respostas)
+        yield linha, registro, resultado, erro
+
+
+def _enviar(executor, backend, grupo, usar_lote):
+    validos = [dados for _, _, dados, erro in grupo if erro is None]
+    if validos:
+        return executor.submit(_calcular_grupo, backend, validos, usar_lote)
+    futuro = Future()
+    futuro.set_result([])
+    return futuro
+
+
+def calcular_propriedades(backend, propriedades, concorrencia=8, tamanho_lote=100, usar_lote=True):
+    """Calcula os créditos das propriedades e gera ``(linha, registro, resultado, erro)``.
+
+    No máximo ``concorrencia`` chamadas ficam em voo e apenas uma janela
+    limitada de registros é lida do arquivo de cada vez; os resultados
+    saem na ordem das linhas de entrada.
+    """
+    validadas = _validar(propriedades)
+    usar_lote = usar_lote and backend.base_url not in lote_indisponivel
+    if usar_lote:
+        # O primeiro grupo descobre se o backend tem o endpoint de lote
+        primeiro = list(islice(validadas, tamanho_lote))
+        validos = [dados for _, _, dados, erro in primeiro if erro is None]
+        respostas = _calcular_em_lote(backend, validos) if validos else []
+        if respostas is None:
+            lote_indisponivel.add(backend.base_url)
+            usar_lote = False
+            validadas = chain(primeiro, validadas)
+        else:
+            yield from _combinar(primeiro, respostas)
+
+    tamanho = tamanho_lote if usar_lote else 1
+    janela = deque()
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix='calculo') as executor:
+        while True:
+            grupo = list(islice(validadas, tamanho))
+            if not grupo:
+                break
+            janela.append((grupo, _enviar(executor, backend, grupo, usar_lote)))
+            if len(janela) >= 2 * concorrencia:
+                grupo, futuro = janela.popleft()
+                yield from _combinar(grupo, futuro.result())
+        while janela:
+            grupo, futuro = janela.popleft()
+            yield from _combinar(grupo, futuro.result())
+
+
+def _diretorio():
+    diretorio = current_app.config['CALCULO_LOTE_DIR']
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def caminho_resultado(tarefa_id):
+    """Arquivo CSV com o resultado de uma tarefa de cálculo em lote"""
+    return os.path.join(_diretorio(), f'{tarefa_id}.csv')
+
+
+def _limpar_antigos(diretorio):
+    limite = time.time() - current_app.config['CALCULO_LOTE_MAX_IDADE']
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def guardar_envio(arquivo):
+    """Copia o arquivo enviado para o disco, em blocos, e retorna o caminho.
+
+    O upload precisa sobreviver à requisição, pois é lido pela tarefa em
+    segundo plano; resultados antigos são removidos a cada novo envio.
+    """
+    diretorio = _diretorio()
+    _limpar_antigos(diretorio)
+    caminho = os.path.join(diretorio, f'{uuid.uuid4().hex}.entrada')
+    arquivo.save(caminho)
+    return caminho
+
+
+def calcular_lote(tarefa, caminho, formato):
+    """Tarefa que calcula cada propriedade do arquivo e grava o CSV de resultados.
+
+    Retorna os totais do lote; o arquivo de entrada é removido ao final.
+    """
+    config = current_app.config
+    backend = get_backend()
+    tarefas = get_tarefas()
+    totais = {'propriedades': 0, 'calculadas': 0, 'rejeitadas': 0,
+              'total_creditos': 0.0, 'valor_estimado': 0.0, 'area_total': 0.0}
+    destino = caminho_resultado(tarefa.id)
+    parcial = destino + '.parcial'
+    try:
+        # Primeira passada só conta os registros, para o progresso
+        tarefa.total = sum(1 for _ in ler_propriedades(caminho, formato))
+        tarefas.publicar(tarefa)
+
+        with open(parcial, 'w', encoding='utf-8', newline='') as saida:
+            escritor = csv.DictWriter(saida, CAMPOS_RESULTADO, extrasaction='ignore')
+            escritor.writeheader()
+            propriedades = calcular_propriedades(backend, ler_propriedades(caminho, formato),
+                                                 concorrencia=config['CALCULO_LOTE_CONCORRENCIA'],
+                                                 tamanho_lote=config['CALCULO_LOTE_TAMANHO'],
+                                                 usar_lote=config['BACKEND_BULK_CALCULO'])
+            for linha, registro, resultado, erro in propriedades:
+                registro = registro if isinstance(registro, dict) else {}
+                saida_linha = dict(registro, linha=linha, erro=erro or '')
+                totais['propriedades'] += 1
+                if resultado is None:
+                    totais['rejeitadas'] += 1
+                    tarefa.falhas += 1
+                else:
+                    creditos = resultado.get('total_creditos', 0)
+                    valor = resultado.get('valor_estimado', 0)
+                    saida_linha.update(id=resultado.get('id') or resultado.get('cenario_id') or '',
+                                       total_creditos=creditos, valor_estimado=valor)
+                    totais['calculadas'] += 1
+                    totais['total_creditos'] += creditos
+                    totais['valor_estimado'] += valor
+                    totais['area_total'] += sum(_numero(registro.get(area)) for area in AREAS)
+                escritor.writerow(saida_linha)
+                tarefa.concluidos = totais['propriedades']
+                tarefas.publicar(tarefa, forcar=False)
+        os.replace(parcial, destino)
+    finally:
+        os.remove(caminho)
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        # Cada cálculo cria um cenário no backend
+        if totais['calculadas']:
+            get_cenario_cache().invalidar_lista()
+            get_feed().sincronizar()
+    return totais
@@ -0,0 +1,264 @@
+import requests
+from flask import current_app
+
+from .agregados import get_agregados
+from .backend import get_backend
+from .cache import get_cenario_cache
+from .calculo import get_cache_calculo
+from .degradacao import get_revalidacao, marcar_obsoleto
+from .exclusao import excluir_cenarios
+from .feed import get_feed
+from .metricas import get_metricas
+from .paginacao import ListagemLocal, Pagina
+from .tarefas import get_tarefas
+
+_listagem = ListagemLocal()
+
+
+def _lista_em_cache():
+    """Retorna ``(versao, cenarios)`` do cache, ou None se ausente.
+
+    Os agregados do dashboard só são recalculados por completo quando a
+    lista vem do backend ou foi regravada por outro worker.
+    """
+    entrada = get_cenario_cache().obter_lista_versionada()
+    if entrada is not None:
+        versao, cenarios = entrada
+        agregados = get_agregados()
+        if agregados.versao != versao:
+            agregados.recalcular(cenarios, versao)
+    return entrada
+
+
+def _backend_falhou(response):
+    """Sem resposta (erro de conexão, circuito aberto) ou erro do próprio backend"""
+    return response is None or response.status_code >= 500
+
+
+def _consultar(path, **kwargs):
+    """GET no backend; None se ele não respondeu ou o circuito está aberto"""
+    try:
+        return get_backend().get(path, **kwargs)
+    except requests.RequestException as e:
+        current_app.logger.warning('Backend indisponível em %s: %s', path, e)
+        return None
+
+
+def _lista_de_reserva():
+    """Última lista boa, servida enquanto o backend está fora do ar"""
+    entrada = get_cenario_cache().obter_reserva_lista()
+    if entrada is None:
+        return None
+    versao, cenarios, guardado_em = entrada
+    agregados = get_agregados()
+    if agregados.versao != versao:
+        agregados.recalcular(cenarios, versao)
+    marcar_obsoleto(guardado_em)
+    get_metricas().incrementar('stale_responses_total', tipo='lista')
+    get_revalidacao().agendar('lista', _atualizar_lista)
+    return versao, cenarios
+
+
+def _atualizar_lista():
+    return _lista_da_resposta(get_backend().get("/api/cenarios"))
+
+
+def _lista_obtida(response):
+    """Lista da resposta do backend ou, se ele falhou, a da reserva"""
+    if _backend_falhou(response):
+        return _lista_de_reserva()
+    return _lista_da_resposta(response)
+
+
+def _cenario_de_reserva(id):
+    entrada = get_cenario_cache().obter_reserva_cenario(id)
+    if entrada is None:
+        return None
+    cenario, guardado_em = entrada
+    marcar_obsoleto(guardado_em)
+    get_metricas().incrementar('stale_responses_total', tipo='cenario')
+    get_revalidacao().agendar(f'cenario:{id}', _atualizar_cenario, id)
+    return cenario
+
+
+def _atualizar_cenario(id):
+    return _cenario_da_resposta(id, get_backend().get(f"/api/cenarios/{id}"))
+
+
+def _cenario_obtido(id, response):
+    """Cenário da resposta do backend ou, se ele falhou, o da reserva"""
+    if _backend_falhou(response):
+        return _cenario_de_reserva(id)
+    return _cenario_da_resposta(id, response)
+
+
+def _lista_da_resposta(response):
+    """Guarda a lista recebida do backend; None se ele respondeu com erro"""
+    if response.status_code != 200:
+        return None
+    return _guardar_lista(response.json())
+
+
+def _guardar_lista(cenarios):
+    """Grava a lista recebida como nova versão e recalcula os agregados"""
+    versao = get_cenario_cache().guardar_lista(cenarios)
+    get_agregados().recalcular(cenarios, versao)
+    return versao, cenarios
+
+
+def _pagina_da_resposta(response, parametros):
+    """Página devolvida pelo backend, ou None se ele não pagina"""
+    if response.status_code != 200:
+        return None
+    dados = response.json()
+    if not isinstance(dados, dict) or 'itens' not in dados:
+        return None
+    return Pagina(dados['itens'], dados.get('total', len(dados['itens'])), parametros)
+
+
+def _paginar_lista(entrada, parametros):
+    if entrada is None:
+        return None
+    versao, cenarios = entrada
+    return _listagem.paginar(versao, cenarios, parametros)
+
+
+def _cenario_da_resposta(id, response):
+    """Guarda o cenário recebido do backend; None se ele respondeu com erro"""
+    if response.status_code != 200:
+        return None
+    cenario = response.json()
+    get_cenario_cache().guardar_cenario(id, cenario)
+    return cenario
+
+
+def _carregar_lista():
+    """Retorna ``(versao, cenarios)`` do cache, do backend ou da reserva; None em caso de erro"""
+    return _lista_em_cache() or _lista_obtida(_consultar("/api/cenarios"))
+
+
+def buscar_cenarios():
+    """Lista de cenários do backend, servida do cache quando possível.
+
+    Com o backend fora do ar, devolve a última lista obtida; retorna None
+    se ele responder com erro e não houver reserva.
+    """
+    entrada = _carregar_lista()
+    return None if entrada is None else entrada[1]
+
+
+def buscar_dashboard(serie=True):
+    """Lista de cenários e agregados do dashboard, ou None em caso de erro.
+
+    Sem ``serie`` a série acumulada (só usada pelos gráficos) não é montada.
+    """
+    entrada = _carregar_lista()
+    if entrada is None:
+        return None
+    agregados = get_agregados()
+    return entrada[1], agregados.to_dict() if serie else agregados.resumo()
+
+
+def buscar_pagina(parametros):
+    """Página de cenários filtrada e ordenada, ou None em caso de erro.
+
+    Com ``BACKEND_PAGINATION`` ativo, apenas a janela pedida é buscada no
+    backend; se ele não devolver o formato paginado, a lista completa em
+    cache é fatiada localmente.
+    """
+    if current_app.config['BACKEND_PAGINATION']:
+        response = _consultar("/api/cenarios", params=parametros.to_args())
+        pagina = None if _backend_falhou(response) else _pagina_da_resposta(response, parametros)
+        if pagina is not None:
+            return pagina
+    return _paginar_lista(_carregar_lista(), parametros)
+
+
+def buscar_cenario(id):
+    """Cenário pelo id, servido do cache quando possível.
+
+    Com o backend fora do ar, devolve a última versão obtida do cenário;
+    retorna None se ele responder com erro e não houver reserva.
+    """
+    cenario = get_cenario_cache().obter_cenario(id)
+    if cenario is None:
+        cenario = _cenario_obtido(id, _consultar(f"/api/cenarios/{id}"))
+    return cenario
+
+
+def registrar_inclusao(cenario):
+    """Acrescenta um cenário recém-criado à lista em cache e aos agregados.
+
+    As listas em cache nunca são alteradas no lugar, pois podem estar sendo
+    lidas por outras requisições; grava-se uma nova versão. Se a lista já
+    tinha um cenário com o mesmo id, ele é substituído.
+    """
+    id = cenario.get('id')
+    versoes = get_cenario_cache().alterar_lista(
+        lambda cenarios: [c for c in cenarios if id is None or c.get('id') != id] + [cenario])
+    atualizados = None
+    if versoes is not None:
+        versao, nova_versao = versoes
+        agregados = get_agregados()
+        if agregados.versao == versao:
+            agregados.adicionar(cenario, nova_versao)
+            atualizados = agregados
+    get_feed().incluido(cenario, atualizados)
+
+
+def registrar_exclusao(id):
+    """Retira um cenário excluído da lista em cache e dos agregados"""
+    cache = get_cenario_cache()
+    cache.invalidar_cenario(id, lista=False)
+    get_cache_calculo().invalidar_cenario(id)
+    versoes = cache.alterar_lista(lambda cenarios: [c for c in cenarios if c.get('id') != id])
+    atualizados = None
+    if versoes is not None:
+        versao, nova_versao = versoes
+        agregados = get_agregados()
+        if agregados.versao == versao:
+            agregados.remover(id, nova_versao)
+            atualizados = agregados
+    get_feed().excluido(id, atualizados)
+
+
+def excluir_todos_cenarios(tarefa=None):
+    """Exclui todos os cenários do backend e retorna o resultado por id.
+
+    Quando executada como tarefa em segundo plano, publica o progresso a
+    cada exclusão concluída.
+    """
+    backend = get_backend()
+    ids = _ids_da_resposta(backend.get("/api/cenarios"))
+    config = current_app.config
+    try:
+        resultado = excluir_cenarios(backend, ids,
+                                     concorrencia=config['BULK_DELETE_CONCURRENCY'],
+                                     usar_lote=config['BACKEND_BULK_DELETE'],
+                                     ao_progredir=_acompanhar(tarefa, len(ids)))
+    finally:
+        get_cenario_cache().invalidar_tudo()
+        # Os resultados guardados apontam para cenários que podem ter sido excluídos
+        get_cache_calculo().invalidar_tudo()
+        get_feed().sincronizar()
+    return resultado.to_dict()
+
+
+def _ids_da_resposta(response):
+    if response.status_code != 200:
+        raise RuntimeError(f'Erro ao buscar os cenários (HTTP {response.status_code})')
+    return [cenario['id'] for cenario in response.json()]
+
+
+def _acompanhar(tarefa, total):
+    """Callback de progresso que publica o andamento da tarefa, se houver"""
+    if tarefa is None:
+        return None
+    gerenciador = get_tarefas()
+    tarefa.total = total
+
+    def ao_progredir(concluidos, falhas):
+        tarefa.concluidos = concluidos + falhas
+        tarefa.falhas = falhas
+        gerenciador.publicar(tarefa, forcar=False)
+    return ao_progredir
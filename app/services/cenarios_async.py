@@ -0,0 +1,103 @@
+# Versões assíncronas das buscas de cenários, usadas pelas views async. Cache,
+# agregados e paginação são os mesmos de ``cenarios``; só as chamadas ao
+# backend passam pelo AsyncBackendClient.
+import asyncio
+
+import httpx
+from flask import current_app
+
+from .agregados import get_agregados
+from .backend import CircuitoAberto
+from .backend_async import get_backend_async
+from .cache import get_cenario_cache
+from .calculo import get_cache_calculo
+from .cenarios import (_backend_falhou, _cenario_obtido, _ids_da_resposta, _lista_em_cache,
+                       _lista_obtida, _pagina_da_resposta, _paginar_lista)
+from .exclusao import ResultadoExclusao, aplicar_resposta_lote, lote_indisponivel, motivo_falha
+from .feed import get_feed
+
+
+async def _consultar(path, **kwargs):
+    """GET no backend; None se ele não respondeu ou o circuito está aberto"""
+    try:
+        return await get_backend_async().get(path, **kwargs)
+    except (httpx.HTTPError, CircuitoAberto) as e:
+        current_app.logger.warning('Backend indisponível em %s: %s', path, e)
+        return None
+
+
+async def _carregar_lista():
+    entrada = _lista_em_cache()
+    if entrada is None:
+        entrada = _lista_obtida(await _consultar("/api/cenarios"))
+    return entrada
+
+
+async def buscar_dashboard(serie=True):
+    """Lista de cenários e agregados do dashboard, ou None em caso de erro.
+
+    Sem ``serie`` a série acumulada (só usada pelos gráficos) não é montada.
+    """
+    entrada = await _carregar_lista()
+    if entrada is None:
+        return None
+    agregados = get_agregados()
+    return entrada[1], agregados.to_dict() if serie else agregados.resumo()
+
+
+async def buscar_pagina(parametros):
+    """Página de cenários filtrada e ordenada, ou None em caso de erro"""
+    if current_app.config['BACKEND_PAGINATION']:
+        response = await _consultar("/api/cenarios", params=parametros.to_args())
+        pagina = None if _backend_falhou(response) else _pagina_da_resposta(response, parametros)
+        if pagina is not None:
+            return pagina
+    return _paginar_lista(await _carregar_lista(), parametros)
+
+
+async def buscar_cenario(id):
+    """Cenário pelo id, servido do cache quando possível; None em caso de erro"""
+    cenario = get_cenario_cache().obter_cenario(id)
+    if cenario is None:
+        cenario = _cenario_obtido(id, await _consultar(f"/api/cenarios/{id}"))
+    return cenario
+
+
+async def excluir_todos_cenarios():
+    """Exclui todos os cenários, com no máximo ``BULK_DELETE_CONCURRENCY`` chamadas em voo"""
+    backend = get_backend_async()
+    config = current_app.config
+    ids = _ids_da_resposta(await backend.get("/api/cenarios"))
+    resultado = ResultadoExclusao()
+    try:
+        if ids and config['BACKEND_BULK_DELETE'] and backend.base_url not in lote_indisponivel:
+            try:
+                response = await backend.post("/api/cenarios/excluir-lote", json={'ids': ids})
+            except (httpx.HTTPError, CircuitoAberto) as e:
+                # Como no modo síncrono: a falha vale para cada id do lote
+                for id in ids:
+                    resultado.falha(id, str(e))
+                return resultado.to_dict()
+            if aplicar_resposta_lote(response, ids, resultado):
+                return resultado.to_dict()
+            lote_indisponivel.add(backend.base_url)
+
+        limite = asyncio.Semaphore(max(1, config['BULK_DELETE_CONCURRENCY']))
+
+        async def excluir_um(id):
+            async with limite:
+                try:
+                    motivo = motivo_falha(await backend.delete(f"/api/cenarios/{id}"))
+                except (httpx.HTTPError, CircuitoAberto) as e:
+                    motivo = str(e)
+            if motivo is None:
+                resultado.sucesso(id)
+            else:
+                resultado.falha(id, motivo)
+
+        await asyncio.gather(*(excluir_um(id) for id in ids))
+    finally:
+        get_cenario_cache().invalidar_tudo()
+        get_cache_calculo().invalidar_tudo()
+        get_feed().sincronizar()
+    return resultado.to_dict()
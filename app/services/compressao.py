@@ -0,0 +1,44 @@
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    # Opcional: sem o pacote brotli as respostas são comprimidas só com gzip
+    brotli = None
+
+
+def _codificacoes():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def comprimir(response):
+    """Comprime o corpo com brotli ou gzip, conforme o ``Accept-Encoding`` do cliente.
+
+    Respostas de erro, em streaming ou menores que ``COMPRESSAO_MINIMO``
+    bytes saem como estão. Para quem aceita compressão o ETag passa a ser
+    fraco (também nos 304), já que o corpo comprimido não é byte a byte o
+    da representação original.
+    """
+    response.vary.add('Accept-Encoding')
+    codificacao = request.accept_encodings.best_match(_codificacoes())
+    if codificacao is None or 'Content-Encoding' in response.headers:
+        return response
+    etag, fraco = response.get_etag()
+    if etag is not None and not fraco:
+        response.set_etag(etag, weak=True)
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return response
+
+    config = current_app.config
+    conteudo = response.get_data()
+    if len(conteudo) < config['COMPRESSAO_MINIMO']:
+        return response
+    if codificacao == 'br':
+        conteudo = brotli.compress(conteudo, quality=config['COMPRESSAO_NIVEL_BROTLI'])
+    else:
+        conteudo = gzip.compress(conteudo, compresslevel=config['COMPRESSAO_NIVEL_GZIP'], mtime=0)
+    response.set_data(conteudo)
+    response.headers['Content-Encoding'] = codificacao
+    return response
@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import datetime
+
+import requests
+from flask import current_app, g
+
+from .tarefas import get_tarefas
+
+
+def marcar_obsoleto(guardado_em):
+    """Registra que a resposta atual usa dados da reserva guardados em ``guardado_em``"""
+    g._dados_obsoletos = min(g.get('_dados_obsoletos', guardado_em), guardado_em)
+
+
+def dados_obsoletos():
+    """Momento dos dados mais antigos da reserva usados nesta requisição, ou None"""
+    return g.get('_dados_obsoletos')
+
+
+class Revalidacao:
+    """Modo degradado: aviso nas páginas e atualização da reserva em segundo plano.
+
+    Cada entrada servida da reserva tem no máximo uma atualização em
+    andamento, repetida só depois de ``REVALIDACAO_INTERVALO`` segundos;
+    com o circuito aberto a tentativa falha na hora, sem ocupar o backend.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._em_andamento = set()
+        self._tentativas = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.intervalo = app.config['REVALIDACAO_INTERVALO']
+        app.context_processor(self._contexto)
+        app.extensions['revalidacao'] = self
+
+    def _contexto(self):
+        # Usado por aviso_degradado.html
+        desde = dados_obsoletos()
+        return {'dados_obsoletos': None if desde is None else datetime.fromtimestamp(desde)}
+
+    def agendar(self, chave, funcao, *args):
+        """Executa ``funcao(*args)`` em segundo plano, se ``chave`` não foi tentada há pouco"""
+        agora = time.monotonic()
+        with self._lock:
+            ultima = self._tentativas.get(chave)
+            if chave in self._em_andamento or (ultima is not None and agora - ultima < self.intervalo):
+                return False
+            if len(self._tentativas) > 1024:
+                self._tentativas = {c: t for c, t in self._tentativas.items() if agora - t < self.intervalo}
+            self._em_andamento.add(chave)
+            self._tentativas[chave] = agora
+        get_tarefas().iniciar('revalidacao', self._executar, chave, funcao, *args)
+        return True
+
+    def _executar(self, tarefa, chave, funcao, *args):
+        try:
+            return funcao(*args) is not None
+        except requests.RequestException as e:
+            # Backend ainda fora do ar (ou circuito aberto): a próxima leitura tenta de novo
+            current_app.logger.info('Atualização de %s adiada: %s', chave, e)
+            return False
+        finally:
+            with self._lock:
+                self._em_andamento.discard(chave)
+
+
+def get_revalidacao():
+    return current_app.extensions['revalidacao']
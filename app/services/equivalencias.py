@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from flask import current_app
+
+
+class Equivalencias:
+    """Equivalências de impacto real dos créditos de carbono.
+
+    Os fatores de conversão são lidos uma única vez de um arquivo JSON
+    (categoria -> lista de ``{nome, fator, unidade}``) e guardados em um
+    vetor; os impactos de vários totais saem de um único produto externo
+    entre os totais e esse vetor. Os resultados por total são memorizados.
+    """
+
+    def __init__(self, app=None):
+        self.categorias = ()
+        self.colunas = ()
+        self.fatores = ()
+        self.versao = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        caminho = app.config.get('EQUIVALENCIAS_PATH') or os.path.join(app.root_path, 'data',
+                                                                         'equivalencias.json')
+        self.carregar(caminho)
+        self.por_total = lru_cache(maxsize=app.config['EQUIVALENCIAS_CACHE_MAXSIZE'])(self._montar)
+        app.extensions['equivalencias'] = self
+
+    def carregar(self, caminho):
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        tabela = json.loads(conteudo)
+        self.versao = hashlib.sha1(conteudo).hexdigest()[:12]
+        # Cada coluna do vetor é uma equivalência: (categoria, nome, unidade)
+        self.categorias = tuple((categoria, tuple((item['nome'], item['unidade']) for item in itens))
+                                for categoria, itens in tabela.items())
+        self.colunas = tuple((categoria, nome, unidade)
+                             for categoria, itens in self.categorias for nome, unidade in itens)
+        self.fatores = tuple(float(item['fator']) for itens in tabela.values() for item in itens)
+
+    def calcular(self, totais):
+        """Matriz de impactos: uma linha por total, uma coluna por equivalência"""
+        fatores = self.fatores
+        return [[total * fator for fator in fatores] for total in totais]
+
+    def _montar(self, total):
+        valores = iter(self.calcular((total,))[0])
+        return {
+            categoria: {'impactos': [{'nome': nome, 'valor': next(valores), 'unidade': unidade}
+                                     for nome, unidade in itens]}
+            for categoria, itens in self.categorias
+        }
+
+    def impactos(self, total_creditos):
+        """Impactos de um total de créditos, agrupados por categoria.
+
+        O resultado é compartilhado entre requisições e não deve ser alterado.
+        """
+        return self.por_total(float(total_creditos or 0))
+
+    def portfolio(self, cenarios):
+        """Impactos de cada cenário e do portfólio inteiro, em formato de colunas"""
+        ids = [cenario.get('id') for cenario in cenarios]
+        totais = [float(cenario.get('total_creditos') or 0) for cenario in cenarios]
+        total = sum(totais)
+        return {
+            'total_creditos': total,
+            'impactos': self.impactos(total),
+            'colunas': [{'categoria': categoria, 'nome': nome, 'unidade': unidade}
+                        for categoria, nome, unidade in self.colunas],
+            'cenarios': {'ids': ids, 'total_creditos': totais, 'valores': self.calcular(totais)},
+        }
+
+
+def get_equivalencias():
+    return current_app.extensions['equivalencias']
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+from flask import current_app
+
+
+def _normalizar(texto):
+    """Texto sem acentos e em minúsculas, para filtros e busca"""
+    decomposto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold().strip()
+
+
+def _serializar(estudo):
+    # MappingProxyType não é um dict para o json; ``default`` faz a conversão
+    return json.dumps(estudo, default=dict, ensure_ascii=False)
+
+
+def _congelar(valor):
+    if isinstance(valor, dict):
+        return MappingProxyType({chave: _congelar(item) for chave, item in valor.items()})
+    if isinstance(valor, list):
+        return tuple(_congelar(item) for item in valor)
+    return valor
+
+
+class _Indice:
+    """Estado imutável do catálogo; um novo índice substitui o anterior a cada recarga"""
+
+    def __init__(self, estudos, versao, modificado_em):
+        self.versao = versao
+        self.modificado_em = modificado_em
+        self.estudos = tuple(_congelar(estudo) for estudo in estudos)
+        self.por_id = MappingProxyType({estudo['id']: estudo for estudo in self.estudos})
+        # JSON de cada estudo, serializado uma única vez para a API
+        self.json = MappingProxyType({estudo['id']: _serializar(estudo) for estudo in self.estudos})
+        por_estado = {}
+        por_metodologia = {}
+        textos = {}
+        for estudo in self.estudos:
+            por_estado.setdefault(_normalizar(estudo.get('localizacao')), []).append(estudo['id'])
+            por_metodologia.setdefault(_normalizar(estudo.get('metodologia')), []).append(estudo['id'])
+            textos[estudo['id']] = _normalizar(' '.join(str(estudo.get(campo, '')) for campo in
+                                                        ('titulo', 'descricao', 'localizacao', 'metodologia')))
+        self.por_estado = MappingProxyType({chave: frozenset(ids) for chave, ids in por_estado.items()})
+        self.por_metodologia = MappingProxyType({chave: frozenset(ids) for chave, ids in por_metodologia.items()})
+        self.textos = MappingProxyType(textos)
+        self.estados = tuple(sorted({e['localizacao'] for e in self.estudos if e.get('localizacao')}))
+        self.metodologias = tuple(sorted({e['metodologia'] for e in self.estudos if e.get('metodologia')}))
+
+
+class CatalogoEstudos:
+    """Catálogo de estudos de caso carregado de um arquivo JSON.
+
+    Os estudos são lidos uma vez, congelados e indexados por id, estado e
+    metodologia. O arquivo é verificado no máximo a cada
+    ``ESTUDOS_INTERVALO_VERIFICACAO`` segundos e recarregado se mudou.
+    """
+
+    def __init__(self, app=None):
+        self._indice = None
+        self._verificado_em = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.caminho = app.config.get('ESTUDOS_PATH') or os.path.join(app.root_path, 'data',
+                                                                         'estudos_caso.json')
+        self.intervalo = app.config['ESTUDOS_INTERVALO_VERIFICACAO']
+        self.logger = app.logger
+        self._indice = self._carregar()
+        self._modificado_em = self._indice.modificado_em
+        self._verificado_em = time.monotonic()
+        app.extensions['catalogo_estudos'] = self
+
+    def _carregar(self):
+        modificado_em = os.path.getmtime(self.caminho)
+        with open(self.caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        estudos = json.loads(conteudo)
+        return _Indice(estudos, hashlib.sha1(conteudo).hexdigest()[:12], modificado_em)
+
+    @property
+    def indice(self):
+        agora = time.monotonic()
+        if agora - self._verificado_em >= self.intervalo and self._lock.acquire(blocking=False):
+            try:
+                self._verificado_em = agora
+                modificado_em = os.path.getmtime(self.caminho)
+                if modificado_em != self._modificado_em:
+                    # Uma versão inválida só é tentada (e registrada no log) uma vez
+                    self._modificado_em = modificado_em
+                    self._indice = self._carregar()
+            except (OSError, ValueError, KeyError, TypeError):
+                # Arquivo em edição ou inválido: continua com o catálogo anterior
+                self.logger.exception('Erro ao recarregar o catálogo de estudos de caso')
+            finally:
+                self._lock.release()
+        return self._indice
+
+    @property
+    def versao(self):
+        return self.indice.versao
+
+    @property
+    def modificado_em(self):
+        return datetime.fromtimestamp(int(self.indice.modificado_em), timezone.utc)
+
+    @property
+    def estados(self):
+        return self.indice.estados
+
+    @property
+    def metodologias(self):
+        return self.indice.metodologias
+
+    def obter(self, id):
+        return self.indice.por_id.get(id)
+
+    def filtrar(self, estado='', metodologia='', busca=''):
+        """Estudos que atendem a todos os filtros informados, na ordem do arquivo"""
+        indice = self.indice
+        ids = None
+        if estado:
+            ids = indice.por_estado.get(_normalizar(estado), frozenset())
+        if metodologia:
+            selecionados = indice.por_metodologia.get(_normalizar(metodologia), frozenset())
+            ids = selecionados if ids is None else ids & selecionados
+        termos = _normalizar(busca).split()
+        if ids is None and not termos:
+            return indice.estudos
+        return tuple(estudo for estudo in indice.estudos
+                     if (ids is None or estudo['id'] in ids)
+                     and all(termo in indice.textos[estudo['id']] for termo in termos))
+
+    def para_json(self, estudos):
+        """Lista de estudos em JSON, a partir das serializações feitas na carga"""
+        prontos = self.indice.json
+        return '[' + ','.join(prontos.get(estudo['id']) or _serializar(estudo) for estudo in estudos) + ']'
+
+
+def get_catalogo_estudos():
+    return current_app.extensions['catalogo_estudos']
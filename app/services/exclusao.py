@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+# URLs de backend que responderam não ter o endpoint de exclusão em lote
+lote_indisponivel = set()
+_lock = threading.Lock()
+
+
+class ResultadoExclusao:
+    """Situação de cada id em uma exclusão em lote"""
+
+    def __init__(self):
+        self.excluidos = []
+        self.falhas = {}
+        self._lock = threading.Lock()
+
+    def sucesso(self, id):
+        with self._lock:
+            self.excluidos.append(id)
+
+    def falha(self, id, motivo):
+        with self._lock:
+            self.falhas[id] = motivo
+
+    def to_dict(self):
+        return {
+            'excluidos': list(self.excluidos),
+            'falhas': {str(id): motivo for id, motivo in self.falhas.items()},
+        }
+
+
+def _excluir_um(backend, id):
+    """Retorna None em caso de sucesso ou o motivo da falha"""
+    try:
+        response = backend.delete(f"/api/cenarios/{id}")
+    except requests.RequestException as e:
+        return str(e)
+    return motivo_falha(response)
+
+
+def motivo_falha(response):
+    if response.status_code in (200, 204):
+        return None
+    return f'HTTP {response.status_code}'
+
+
+def _excluir_em_lote(backend, ids, resultado):
+    """Usa ``POST /api/cenarios/excluir-lote`` se o backend oferecer.
+
+    Retorna False quando o endpoint não existe, para cair no modo por id.
+    """
+    try:
+        response = backend.post("/api/cenarios/excluir-lote", json={'ids': ids})
+    except requests.RequestException as e:
+        for id in ids:
+            resultado.falha(id, str(e))
+        return True
+    return aplicar_resposta_lote(response, ids, resultado)
+
+
+def aplicar_resposta_lote(response, ids, resultado):
+    """Interpreta a resposta do endpoint de lote; False se ele não existe"""
+    if response.status_code in (404, 405, 501):
+        return False
+    if response.status_code != 200:
+        for id in ids:
+            resultado.falha(id, f'HTTP {response.status_code}')
+        return True
+    dados = response.json()
+    falhas = {str(id): motivo for id, motivo in dados.get('falhas', {}).items()}
+    excluidos = {str(id) for id in dados.get('excluidos', ids)}
+    for id in ids:
+        if str(id) in falhas:
+            resultado.falha(id, falhas[str(id)])
+        elif str(id) in excluidos:
+            resultado.sucesso(id)
+        else:
+            resultado.falha(id, 'não confirmado pelo backend')
+    return True
+
+
+def excluir_cenarios(backend, ids, concorrencia=8, usar_lote=True, ao_progredir=None):
+    """Exclui os cenários ``ids`` e devolve um ResultadoExclusao.
+
+    As exclusões individuais rodam em um pool limitado a ``concorrencia``
+    threads; ``ao_progredir(concluidos, falhas)`` é chamado a cada resposta.
+    """
+    resultado = ResultadoExclusao()
+    if not ids:
+        return resultado
+
+    chave = backend.base_url
+    if usar_lote and chave not in lote_indisponivel:
+        if _excluir_em_lote(backend, list(ids), resultado):
+            if ao_progredir:
+                ao_progredir(len(resultado.excluidos), len(resultado.falhas))
+            return resultado
+        with _lock:
+            lote_indisponivel.add(chave)
+
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia), thread_name_prefix='exclusao') as executor:
+        futuros = {executor.submit(_excluir_um, backend, id): id for id in ids}
+        for futuro in as_completed(futuros):
+            id = futuros[futuro]
+            motivo = futuro.result()
+            if motivo is None:
+                resultado.sucesso(id)
+            else:
+                resultado.falha(id, motivo)
+            if ao_progredir:
+                ao_progredir(len(resultado.excluidos), len(resultado.falhas))
+    return resultado
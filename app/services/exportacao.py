@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from flask import current_app
+
+from .agregados import AgregadosDashboard
+from .cenarios import buscar_cenario
+from .pdf import (get_pdf_cache, html_para_pdf, html_relatorio_creditos,
+                  renderizar_portfolio, renderizar_relatorio_cenario)
+
+
+class _SaidaZip:
+    """Destino sem seek para o ZipFile; o conteúdo é drenado a cada arquivo escrito"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+class ExportadorLote:
+    """Exporta relatórios de vários cenários em um ZIP ou em um PDF consolidado.
+
+    Os cenários são buscados em paralelo por threads e os PDFs do ZIP
+    renderizados em um pool de processos, contornando o GIL na montagem com
+    FPDF.
+    """
+
+    def __init__(self, app=None):
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.processos = app.config['PDF_LOTE_PROCESSOS'] or os.cpu_count() or 1
+        self.concorrencia_busca = app.config['PDF_LOTE_CONCORRENCIA_BUSCA']
+        self.max_cenarios = app.config['PDF_LOTE_MAX_CENARIOS']
+        app.extensions['exportador_lote'] = self
+
+    @property
+    def pool(self):
+        # 'spawn' evita herdar locks de threads do worker no fork
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            with self._lock:
+                if self._pool is None or self._pid != pid:
+                    self._pool = ProcessPoolExecutor(max_workers=self.processos,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                    self._pid = pid
+        return self._pool
+
+    def buscar(self, ids):
+        """Busca os cenários em paralelo; retorna ``(cenarios, ids_com_falha)`` na ordem pedida"""
+        app = current_app._get_current_object()
+
+        def buscar_um(id):
+            with app.app_context():
+                return buscar_cenario(id)
+
+        encontrados = {}
+        falhas = []
+        with ThreadPoolExecutor(max_workers=self.concorrencia_busca, thread_name_prefix='exportacao') as executor:
+            futuros = {executor.submit(buscar_um, id): id for id in ids}
+            for futuro in as_completed(futuros):
+                id = futuros[futuro]
+                try:
+                    cenario = futuro.result()
+                except Exception:
+                    cenario = None
+                if cenario is None:
+                    falhas.append(id)
+                else:
+                    encontrados[id] = cenario
+        return [(id, encontrados[id]) for id in ids if id in encontrados], sorted(falhas)
+
+    def gerar_zip(self, cenarios, tipo='cenario', falhas=()):
+        """Gera o ZIP em partes, à medida que cada relatório fica pronto.
+
+        PDFs já em cache entram direto; os demais são renderizados no pool de
+        processos. Deve ser consumido dentro do contexto da requisição.
+        """
+        cache = get_pdf_cache()
+        saida = _SaidaZip()
+        with zipfile.ZipFile(saida, mode='w', compression=zipfile.ZIP_STORED) as arquivo:
+            futuros = {}
+            for id, cenario in cenarios:
+                chave = cache.chave(tipo, id, cenario)
+                nome = f'{tipo}_{id}.pdf'
+                conteudo = cache.obter(chave)
+                if conteudo is not None:
+                    arquivo.writestr(nome, conteudo)
+                    yield saida.drenar()
+                elif tipo == 'creditos':
+                    # O HTML depende do contexto da aplicação; só o wkhtmltopdf vai para o pool
+                    futuros[self.pool.submit(html_para_pdf, html_relatorio_creditos(cenario))] = (nome, chave)
+                else:
+                    futuros[self.pool.submit(renderizar_relatorio_cenario, cenario)] = (nome, chave)
+
+            erros = [f'Cenário {id}: não encontrado' for id in falhas]
+            for futuro in as_completed(futuros):
+                nome, chave = futuros[futuro]
+                try:
+                    conteudo = futuro.result()
+                except Exception as e:
+                    erros.append(f'{nome}: {e}')
+                    continue
+                cache.guardar(chave, conteudo)
+                arquivo.writestr(nome, conteudo)
+                yield saida.drenar()
+
+            if erros:
+                arquivo.writestr('erros.txt', '\n'.join(erros) + '\n')
+        yield saida.drenar()
+
+    def gerar_pdf_consolidado(self, cenarios):
+        """PDF único com o resumo do portfólio, calculado como no dashboard.
+
+        Renderizado na própria requisição: o FPDF não junta documentos
+        prontos, então não há o que dividir entre os processos do pool, e
+        enviar tudo como uma única tarefa só somaria o custo de serializar
+        os cenários.
+        """
+        agregados = AgregadosDashboard()
+        agregados.recalcular([cenario for _, cenario in cenarios])
+        resumo = agregados.to_dict()
+        del resumo['datas'], resumo['creditos_acumulados']
+        return renderizar_portfolio(resumo, [c for _, c in cenarios])
+
+
+def get_exportador():
+    return current_app.extensions['exportador_lote']
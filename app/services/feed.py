@@ -0,0 +1,268 @@
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+import requests
+from flask import current_app, render_template
+
+from .agregados import get_agregados
+from .backend import get_backend
+from .paginacao import filtrar_e_ordenar
+from .pdf import hash_cenario
+
+
+def _resumo(agregados):
+    """Totais do dashboard.
+
+    A série não vai nos eventos: agrupada por data e reduzida, ela não
+    aceita pontos avulsos, e o dashboard a busca de novo em
+    ``/api/dashboard/graficos``.
+    """
+    return {'totais': agregados.resumo()}
+
+
+class FeedCenarios:
+    """Alterações de cenários transmitidas aos dashboards abertos (Server-Sent Events).
+
+    Inclusões e exclusões feitas por este worker são publicadas na hora,
+    com os totais já atualizados. Enquanto houver dashboards conectados,
+    uma thread consulta o backend a cada ``FEED_INTERVALO_POLLING``
+    segundos e transforma as diferenças (feitas por outros workers ou
+    sistemas) em eventos. Os eventos ficam em um buffer circular; quem
+    reconecta recebe apenas o que perdeu.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._eventos = deque()
+        self._reiniciar()
+        if app is not None:
+            self.init_app(app)
+
+    def _reiniciar(self):
+        self._cond = threading.Condition()
+        self._eventos = deque(maxlen=self._eventos.maxlen)
+        self._seq = 0
+        self._conhecidos = None
+        self._etag = None
+        self._mutacoes = 0
+        self._assinantes = 0
+        self._thread = None
+        self._pedido = threading.Event()
+        # Os ids dos eventos só valem para este processo
+        self.token = secrets.token_hex(4)
+        self._pid = os.getpid()
+
+    def _processo(self):
+        # Com gunicorn --preload os workers herdam o feed do processo pai:
+        # cada um precisa do seu token, buffer e thread de consulta
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._reiniciar()
+
+    def init_app(self, app):
+        config = app.config
+        self.app = app
+        self._eventos = deque(maxlen=config['FEED_MAXSIZE'])
+        self.intervalo_polling = config['FEED_INTERVALO_POLLING']
+        self.keepalive = config['FEED_KEEPALIVE']
+        self.duracao_maxima = config['FEED_DURACAO_MAXIMA']
+        self.max_alteracoes = config['FEED_MAX_ALTERACOES']
+        self.logger = app.logger
+        app.extensions['feed_cenarios'] = self
+
+    @property
+    def cursor(self):
+        """Posição atual do feed, usada pela página para não perder eventos"""
+        self._processo()
+        return f'{self.token}:{self._seq}'
+
+    def _publicar(self, tipo, **dados):
+        self._processo()
+        with self._cond:
+            self._seq += 1
+            dados.update(tipo=tipo, seq=self._seq)
+            self._eventos.append(dados)
+            self._cond.notify_all()
+
+    # Alterações feitas por este worker
+
+    def incluido(self, cenario, agregados=None):
+        """Publica um cenário novo; ``agregados`` só é passado se já o incluem"""
+        self._processo()
+        with self._cond:
+            self._mutacoes += 1
+            if self._conhecidos is not None and 'id' in cenario:
+                self._conhecidos[cenario['id']] = hash_cenario(cenario)
+        resumo = _resumo(agregados) if agregados is not None else {}
+        self._publicar('inclusao', id=cenario.get('id'), cenario=cenario,
+                       linha=render_template('linha_cenario.html', cenario=cenario), **resumo)
+        if agregados is None:
+            # Sem a lista em cache os totais vêm da próxima consulta ao backend
+            self.sincronizar()
+
+    def excluido(self, id, agregados=None):
+        self._processo()
+        with self._cond:
+            self._mutacoes += 1
+            if self._conhecidos is not None:
+                self._conhecidos.pop(id, None)
+        self._publicar('exclusao', id=id, **(_resumo(agregados) if agregados is not None else {}))
+        if agregados is None:
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Pede uma consulta ao backend assim que possível (ex.: após alterações em lote)"""
+        self._processo()
+        self._pedido.set()
+
+    # Consulta periódica ao backend
+
+    def _assinar(self):
+        self._processo()
+        with self._cond:
+            self._assinantes += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._acompanhar, name='feed-cenarios', daemon=True)
+                self._thread.start()
+
+    def _desassinar(self):
+        with self._cond:
+            self._assinantes -= 1
+
+    def _acompanhar(self):
+        with self.app.app_context():
+            while True:
+                pedido = self._pedido.wait(self.intervalo_polling or self.keepalive)
+                with self._cond:
+                    if not self._assinantes:
+                        self._thread = None
+                        return
+                if not (pedido or self.intervalo_polling):
+                    continue
+                self._pedido.clear()
+                try:
+                    self._sincronizar(pedido)
+                except requests.RequestException as e:
+                    self.logger.warning('Backend indisponível para o feed de cenários: %s', e)
+                except Exception:
+                    self.logger.exception('Erro ao consultar as alterações de cenários')
+
+    def _sincronizar(self, pedido):
+        # Import tardio: cenarios publica neste feed
+        from .cenarios import _guardar_lista
+        mutacoes = self._mutacoes
+        cabecalhos = {'If-None-Match': self._etag} if self._etag and self._conhecidos is not None else {}
+        response = get_backend().get("/api/cenarios", headers=cabecalhos)
+        if response.status_code == 304:
+            if pedido:
+                self._publicar_totais()
+            return
+        if response.status_code != 200:
+            return
+        self._etag = response.headers.get('ETag')
+        cenarios = response.json()
+        atuais = {cenario['id']: cenario for cenario in cenarios if 'id' in cenario}
+        hashes = {id: hash_cenario(cenario) for id, cenario in atuais.items()}
+        with self._cond:
+            if self._mutacoes != mutacoes:
+                # Uma alteração deste worker pode não estar na lista recebida: tenta de novo depois
+                self._pedido.set()
+                return
+            conhecidos, self._conhecidos = self._conhecidos, hashes
+        if conhecidos is None:
+            if pedido:
+                # Sincronização pedida após uma alteração em lote: a lista do cache pode estar velha
+                _guardar_lista(cenarios)
+                self._publicar_totais()
+            return
+        removidos = [id for id in conhecidos if id not in hashes]
+        alterados = [id for id, valor in hashes.items() if conhecidos.get(id) != valor]
+        if removidos or alterados:
+            # Só uma lista diferente substitui a do cache (e os agregados incrementais)
+            _guardar_lista(cenarios)
+        if len(removidos) + len(alterados) > self.max_alteracoes:
+            self._publicar('recarregar')
+            return
+        for id in removidos:
+            self._publicar('exclusao', id=id)
+        for id in alterados:
+            self._publicar('inclusao', id=id, cenario=atuais[id],
+                           linha=render_template('linha_cenario.html', cenario=atuais[id]))
+        if removidos or alterados or pedido:
+            self._publicar_totais()
+
+    def _publicar_totais(self):
+        agregados = get_agregados()
+        if agregados.versao is not None:
+            self._publicar('totais', **_resumo(agregados))
+
+    # Transmissão
+
+    def _aguardar(self, desde, timeout):
+        """Eventos depois de ``desde``; None se parte deles já saiu do buffer"""
+        with self._cond:
+            if self._seq <= desde:
+                self._cond.wait(timeout)
+            if self._seq <= desde:
+                return []
+            if not self._eventos or self._eventos[0]['seq'] > desde + 1:
+                return None
+            return [evento for evento in self._eventos if evento['seq'] > desde]
+
+    def _formatar(self, evento, parametros):
+        dados = {chave: valor for chave, valor in evento.items() if chave not in ('cenario', 'seq', 'tipo')}
+        if 'cenario' in evento:
+            # Cada dashboard só exibe a linha se o cenário passa pelos seus filtros
+            dados['visivel'] = bool(filtrar_e_ordenar([evento['cenario']], parametros))
+        return (f"id: {self.token}:{evento.get('seq', self._seq)}\n"
+                f"event: {evento['tipo']}\n"
+                f"data: {json.dumps(dados, ensure_ascii=False)}\n\n")
+
+    def _inicio(self, cursor):
+        """Posição de partida; cursores de outro processo recebem os totais atuais"""
+        self._processo()
+        token, _, seq = (cursor or '').partition(':')
+        if token == self.token and seq.isdigit() and int(seq) <= self._seq:
+            return int(seq), None
+        agregados = get_agregados()
+        if agregados.versao is None:
+            self.sincronizar()
+            return self._seq, None
+        return self._seq, dict(_resumo(agregados), tipo='totais')
+
+    def transmitir(self, cursor, parametros):
+        """Gera o stream ``text/event-stream`` a partir de ``cursor``.
+
+        A conexão é encerrada após ``FEED_DURACAO_MAXIMA`` segundos e o
+        navegador reconecta com ``Last-Event-ID``, sem perder eventos.
+        """
+        desde, inicial = self._inicio(cursor)
+        self._assinar()
+        try:
+            yield f'retry: {int(self.keepalive * 1000)}\n\n'
+            if inicial is not None:
+                yield self._formatar(inicial, parametros)
+            fim = time.monotonic() + self.duracao_maxima
+            while time.monotonic() < fim:
+                eventos = self._aguardar(desde, min(self.keepalive, max(0, fim - time.monotonic())))
+                if eventos is None:
+                    desde = self._seq
+                    yield self._formatar({'tipo': 'recarregar', 'seq': desde}, parametros)
+                elif not eventos:
+                    yield ': keepalive\n\n'
+                else:
+                    for evento in eventos:
+                        yield self._formatar(evento, parametros)
+                    desde = eventos[-1]['seq']
+        finally:
+            self._desassinar()
+
+
+def get_feed():
+    return current_app.extensions['feed_cenarios']
@@ -0,0 +1,66 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from .cache import TTLCache
+
+
+class CacheFragmentos:
+    """HTML renderizado de páginas estáticas e ETags das páginas dinâmicas.
+
+    As ETags combinam os dados da página com a versão dos templates, de
+    modo que um deploy com templates alterados nunca devolve 304 para um
+    HTML antigo. Páginas estáticas ficam renderizadas em memória, até
+    ``FRAGMENTOS_MAXSIZE`` páginas: visitas repetidas não passam pelo Jinja.
+    """
+
+    def __init__(self, app=None):
+        self._itens = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self._itens = TTLCache(maxsize=app.config['FRAGMENTOS_MAXSIZE'], ttl=app.config['FRAGMENTOS_TTL'])
+        self._ler_templates(app)
+        app.extensions['cache_fragmentos'] = self
+
+    def _ler_templates(self, app):
+        # A versão depende só do conteúdo: é a mesma em todos os workers e máquinas
+        pasta = os.path.join(app.root_path, app.template_folder)
+        assinatura = hashlib.sha1()
+        modificado_em = 0
+        for raiz, _, arquivos in sorted(os.walk(pasta)):
+            for nome in sorted(arquivos):
+                caminho = os.path.join(raiz, nome)
+                with open(caminho, 'rb') as arquivo:
+                    assinatura.update(arquivo.read())
+                modificado_em = max(modificado_em, os.path.getmtime(caminho))
+        self.versao_templates = assinatura.hexdigest()[:12]
+        self.modificado_em = datetime.fromtimestamp(int(modificado_em), timezone.utc)
+
+    def etag(self, *partes):
+        dados = ':'.join(str(parte) for parte in (self.versao_templates,) + partes)
+        return hashlib.sha1(dados.encode('utf-8')).hexdigest()[:20]
+
+    def obter(self, chave, renderizar):
+        """Retorna ``(html, etag)`` da página, renderizando-a só na primeira vez"""
+        item = self._itens.get(chave)
+        if item is None:
+            html = renderizar()
+            item = (html, self.etag(*chave, hashlib.sha1(html.encode('utf-8')).hexdigest()))
+            self._itens.set(chave, item)
+        return item
+
+    def limpar(self):
+        self._itens.clear()
+
+    def estatisticas(self):
+        dados = self._itens.stats.to_dict()
+        dados['entradas'] = len(self._itens)
+        return dados
+
+
+def get_fragmentos():
+    return current_app.extensions['cache_fragmentos']
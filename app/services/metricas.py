@@ -0,0 +1,281 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+
+# Faixas (em segundos) dos histogramas de latência
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Nome da métrica -> (tipo, descrição), na ordem em que são exportadas
+DESCRICOES = {
+    'http_requests_total': ('counter', 'Requisições atendidas por rota, método e status'),
+    'http_request_duration_seconds': ('histogram', 'Tempo total das requisições por rota'),
+    'http_request_phase_seconds': ('histogram', 'Tempo das requisições em cada fase (backend, template, pdf)'),
+    'pdf_render_seconds': ('histogram', 'Tempo de renderização de cada PDF'),
+    'backend_requests_total': ('counter', 'Chamadas ao backend por rota e status HTTP'),
+    'backend_errors_total': ('counter', 'Chamadas ao backend com erro de conexão ou status 5xx'),
+    'backend_request_duration_seconds': ('summary', 'Tempo das chamadas ao backend por rota'),
+    'backend_circuit_open': ('gauge', 'Circuito da rota aberto (1) ou fechado/em teste (0)'),
+    'backend_circuit_opens_total': ('counter', 'Vezes que o circuito da rota abriu'),
+    'backend_circuit_rejected_total': ('counter', 'Chamadas recusadas com o circuito aberto'),
+    'stale_responses_total': ('counter', 'Dados servidos da reserva com o backend fora do ar'),
+    'cache_hits_total': ('counter', 'Acertos de cada cache'),
+    'cache_misses_total': ('counter', 'Falhas de cada cache'),
+    'cache_evictions_total': ('counter', 'Entradas removidas por tamanho ou expiração'),
+    'cache_entries': ('gauge', 'Entradas guardadas em cada cache'),
+}
+
+# Nome na métrica -> extensão com ``estatisticas()`` no formato de EstatisticasCache
+CACHES = {
+    'cenarios': 'cenario_cache',
+    'calculo': 'cache_calculo',
+    'resultados': 'resultados_calculo',
+    'fragmentos': 'cache_fragmentos',
+    'pdf': 'pdf_cache',
+}
+
+_NOME_ARQUIVO_RE = re.compile(r'[^A-Za-z0-9]+')
+
+
+def acumular(fase, duracao):
+    """Soma ``duracao`` à fase da requisição atual; fora de uma requisição não faz nada"""
+    if has_request_context():
+        fases = g.setdefault('_metricas_fases', {})
+        fases[fase] = fases.get(fase, 0.0) + duracao
+
+
+@contextmanager
+def medir(fase):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        acumular(fase, time.perf_counter() - inicio)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos, **extras):
+    itens = list(rotulos) + list(extras.items())
+    if not itens:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in itens) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    """Contagens por faixa de duração, exportadas de forma cumulativa como no Prometheus"""
+
+    def __init__(self, limites=LIMITES):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        # ``le`` é inclusivo: um valor igual ao limite cai na faixa dele
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{_rotulos(rotulos, le=_numero(float(limite)))} {acumulado}'
+        yield f'{nome}_bucket{_rotulos(rotulos, le="+Inf")} {self.total}'
+        yield f'{nome}_sum{_rotulos(rotulos)} {_numero(self.soma)}'
+        yield f'{nome}_count{_rotulos(rotulos)} {self.total}'
+
+
+class Metricas:
+    """Instrumentação das requisições e exportação no formato texto do Prometheus.
+
+    Cada requisição registra o tempo total e o tempo gasto esperando o
+    backend, renderizando templates e gerando PDFs. Os contadores do
+    cliente do backend e dos caches são lidos no momento da exportação.
+    Os valores são por processo: com vários workers, cada um tem os seus.
+
+    Com ``PROFILER_AMOSTRAGEM`` > 0, essa fração das requisições roda sob
+    o cProfile e as que passam de ``PROFILER_LIMITE`` segundos têm o perfil
+    gravado em ``PROFILER_DIR``.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._histogramas = {}
+        self._contadores = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.amostragem = config['PROFILER_AMOSTRAGEM']
+        self.limite_lento = config['PROFILER_LIMITE']
+        self.diretorio_perfis = config['PROFILER_DIR']
+        self.max_perfis = config['PROFILER_MAX_ARQUIVOS']
+        self.logger = app.logger
+        if config['METRICAS_ATIVAS']:
+            app.before_request(self._iniciar)
+            app.after_request(self._registrar_status)
+            app.teardown_request(self._finalizar)
+            before_render_template.connect(self._antes_template, app)
+            template_rendered.connect(self._depois_template, app)
+        app.extensions['metricas'] = self
+
+    def observar(self, nome, valor, **rotulos):
+        chave = (nome, tuple(rotulos.items()))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(valor)
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(rotulos.items()))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    # Ganchos da requisição
+
+    def _iniciar(self):
+        g._metricas_inicio = time.perf_counter()
+        if self.amostragem and random.random() < self.amostragem:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Outro profiler já está ativo nesta thread
+                return
+            g._metricas_perfil = perfil
+
+    def _registrar_status(self, response):
+        g._metricas_status = response.status_code
+        return response
+
+    def _finalizar(self, erro=None):
+        inicio = g.pop('_metricas_inicio', None)
+        if inicio is None:
+            return
+        duracao = time.perf_counter() - inicio
+        perfil = g.pop('_metricas_perfil', None)
+        if perfil is not None:
+            perfil.disable()
+        # Rotas inexistentes ficam agrupadas para não criar uma série por URL
+        rota = request.url_rule.rule if request.url_rule is not None else 'nao_encontrada'
+        status = g.pop('_metricas_status', 500)
+        self.incrementar('http_requests_total', rota=rota, metodo=request.method, status=status)
+        self.observar('http_request_duration_seconds', duracao, rota=rota, metodo=request.method)
+        for fase, tempo in g.pop('_metricas_fases', {}).items():
+            self.observar('http_request_phase_seconds', tempo, rota=rota, fase=fase)
+        if perfil is not None and duracao >= self.limite_lento:
+            self._guardar_perfil(perfil, rota, duracao)
+
+    def _antes_template(self, sender, template, context, **extra):
+        g.setdefault('_metricas_templates', []).append(time.perf_counter())
+
+    def _depois_template(self, sender, template, context, **extra):
+        inicios = g.get('_metricas_templates')
+        if inicios:
+            acumular('template', time.perf_counter() - inicios.pop())
+
+    # Profiler
+
+    def _guardar_perfil(self, perfil, rota, duracao):
+        try:
+            os.makedirs(self.diretorio_perfis, exist_ok=True)
+            trecho = _NOME_ARQUIVO_RE.sub('_', rota).strip('_') or 'raiz'
+            nome = f'{datetime.now():%Y%m%d-%H%M%S}_{request.method}_{trecho}_{int(duracao * 1000)}ms.prof'
+            caminho = os.path.join(self.diretorio_perfis, nome)
+            perfil.dump_stats(caminho)
+            self._limpar_perfis()
+        except OSError:
+            self.logger.exception('Erro ao gravar o perfil da requisição lenta')
+            caminho = None
+        resumo = io.StringIO()
+        pstats.Stats(perfil, stream=resumo).sort_stats('cumulative').print_stats(15)
+        self.logger.warning('Requisição lenta: %s %s em %.3fs (perfil: %s)\n%s',
+                            request.method, rota, duracao, caminho, resumo.getvalue())
+
+    def _limpar_perfis(self):
+        arquivos = sorted(os.path.join(self.diretorio_perfis, nome)
+                          for nome in os.listdir(self.diretorio_perfis) if nome.endswith('.prof'))
+        for caminho in arquivos[:-self.max_perfis]:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    # Exportação
+
+    def _coletar(self):
+        """Métricas lidas das outras extensões: ``{nome: [(rotulos, valor)]}``"""
+        coletadas = {}
+        backend = current_app.extensions.get('backend')
+        if backend is not None:
+            for rota, dados in sorted(backend.estatisticas().items()):
+                for status, chamadas in sorted(dados['status'].items()):
+                    coletadas.setdefault('backend_requests_total', []).append(
+                        ((('rota', rota), ('status', status)), chamadas))
+                coletadas.setdefault('backend_errors_total', []).append(((('rota', rota),), dados['erros']))
+                coletadas.setdefault('backend_request_duration_seconds_sum', []).append(
+                    ((('rota', rota),), dados['tempo_total']))
+                coletadas.setdefault('backend_request_duration_seconds_count', []).append(
+                    ((('rota', rota),), dados['chamadas']))
+            for rota, circuito in sorted(backend.circuitos().items()):
+                rotulos = (('rota', rota),)
+                coletadas.setdefault('backend_circuit_open', []).append(
+                    (rotulos, int(circuito['estado'] == 'aberto')))
+                coletadas.setdefault('backend_circuit_opens_total', []).append((rotulos, circuito['aberturas']))
+                coletadas.setdefault('backend_circuit_rejected_total', []).append((rotulos, circuito['recusadas']))
+        for nome, extensao in CACHES.items():
+            cache = current_app.extensions.get(extensao)
+            if cache is None:
+                continue
+            dados = cache.estatisticas()
+            rotulos = (('cache', nome),)
+            coletadas.setdefault('cache_hits_total', []).append((rotulos, dados['acertos']))
+            coletadas.setdefault('cache_misses_total', []).append((rotulos, dados['falhas']))
+            coletadas.setdefault('cache_evictions_total', []).append(
+                (rotulos, dados['removidas'] + dados['expiradas']))
+            coletadas.setdefault('cache_entries', []).append((rotulos, dados['entradas']))
+        return coletadas
+
+    def exportar(self):
+        """Todas as métricas no formato texto do Prometheus (versão 0.0.4)"""
+        coletadas = self._coletar()
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = [(chave, list(h.linhas(*chave))) for chave, h in sorted(self._histogramas.items())]
+        linhas = []
+        for nome, (tipo, descricao) in DESCRICOES.items():
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+            for (nome_contador, rotulos), valor in contadores:
+                if nome_contador == nome:
+                    linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+            for (nome_histograma, _), linhas_histograma in histogramas:
+                if nome_histograma == nome:
+                    linhas.extend(linhas_histograma)
+            for sufixo in ('', '_sum', '_count'):
+                for rotulos, valor in coletadas.get(nome + sufixo, ()):
+                    linhas.append(f'{nome}{sufixo}{_rotulos(rotulos)} {_numero(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+def get_metricas():
+    return current_app.extensions['metricas']
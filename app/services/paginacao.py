@@ -0,0 +1,125 @@
+import math
+
+from .cache import TTLCache
+
+CAMPOS_ORDENACAO = {
+    'data_calculo': '',
+    'total_creditos': 0,
+    'valor_estimado': 0,
+}
+
+# Filtro de metodologia -> campo de crédito que precisa ser positivo
+METODOLOGIAS_FILTRO = {
+    'pastagem': 'credito_pastagem',
+    'florestal': 'credito_florestal',
+    'renovacao': 'credito_renovacao',
+    'integracao': 'credito_integracao',
+}
+
+
+def _inteiro(valor, padrao, minimo, maximo):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        return padrao
+    return max(minimo, min(valor, maximo))
+
+
+class ParametrosListagem:
+    """Página, ordenação e filtros da lista de cenários do dashboard"""
+
+    def __init__(self, pagina=1, limite=50, ordem='data_calculo', direcao='desc',
+                 localizacao='', metodologia=''):
+        self.pagina = pagina
+        self.limite = limite
+        self.ordem = ordem
+        self.direcao = direcao
+        self.localizacao = localizacao
+        self.metodologia = metodologia
+
+    @classmethod
+    def from_args(cls, args, limite_padrao=50, limite_maximo=500):
+        ordem = args.get('ordem', 'data_calculo')
+        metodologia = args.get('metodologia', '')
+        return cls(
+            pagina=_inteiro(args.get('page'), 1, 1, 10 ** 9),
+            limite=_inteiro(args.get('limit'), limite_padrao, 1, limite_maximo),
+            ordem=ordem if ordem in CAMPOS_ORDENACAO else 'data_calculo',
+            direcao='asc' if args.get('direcao') == 'asc' else 'desc',
+            localizacao=args.get('localizacao', '').strip(),
+            metodologia=metodologia if metodologia in METODOLOGIAS_FILTRO else '',
+        )
+
+    @property
+    def chave_filtro(self):
+        return (self.ordem, self.direcao, self.localizacao.lower(), self.metodologia)
+
+    def to_args(self, **alteracoes):
+        """Parâmetros de query string, usados nos links de paginação"""
+        args = {
+            'page': self.pagina,
+            'limit': self.limite,
+            'ordem': self.ordem,
+            'direcao': self.direcao,
+            'localizacao': self.localizacao,
+            'metodologia': self.metodologia,
+        }
+        args.update(alteracoes)
+        return {chave: valor for chave, valor in args.items() if valor not in ('', None)}
+
+
+class Pagina:
+    """Janela de cenários exibida e informações de navegação"""
+
+    def __init__(self, itens, total, parametros):
+        self.itens = itens
+        self.total = total
+        self.parametros = parametros
+        self.pagina = parametros.pagina
+        self.limite = parametros.limite
+        self.paginas = max(1, math.ceil(total / parametros.limite))
+
+    @property
+    def tem_anterior(self):
+        return self.pagina > 1
+
+    @property
+    def tem_proxima(self):
+        return self.pagina < self.paginas
+
+
+def filtrar_e_ordenar(cenarios, parametros):
+    localizacao = parametros.localizacao.lower()
+    campo_metodologia = METODOLOGIAS_FILTRO.get(parametros.metodologia)
+    if localizacao or campo_metodologia:
+        cenarios = [
+            c for c in cenarios
+            if (not localizacao or localizacao in str(c.get('localizacao') or '').lower())
+            and (not campo_metodologia or (c.get(campo_metodologia) or 0) > 0)
+        ]
+    padrao = CAMPOS_ORDENACAO[parametros.ordem]
+    return sorted(
+        cenarios,
+        key=lambda c: c.get(parametros.ordem) or padrao,
+        reverse=parametros.direcao == 'desc',
+    )
+
+
+class ListagemLocal:
+    """Pagina a lista de cenários em cache.
+
+    O resultado filtrado e ordenado é memorizado por versão da lista, de
+    modo que navegar entre páginas não reordena a lista inteira.
+    """
+
+    def __init__(self, maxsize=32, ttl=300):
+        self._ordenadas = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def paginar(self, versao, cenarios, parametros):
+        chave = (versao,) + parametros.chave_filtro
+        ordenados = self._ordenadas.get(chave)
+        if ordenados is None:
+            ordenados = filtrar_e_ordenar(cenarios, parametros)
+            self._ordenadas.set(chave, ordenados)
+        inicio = (parametros.pagina - 1) * parametros.limite
+        return Pagina(ordenados[inicio:inicio + parametros.limite], len(ordenados), parametros)
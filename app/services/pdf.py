@@ -0,0 +1,310 @@
+import hashlib
+import importlib
+import json
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import click
+from flask import current_app, render_template
+
+from .cache import EstatisticasCache
+from .metricas import acumular, get_metricas
+from .tarefas import get_tarefas
+
+OPCOES_PDFKIT = {
+    'page-size': 'A4',
+    'margin-top': '0.75in',
+    'margin-right': '0.75in',
+    'margin-bottom': '0.75in',
+    'margin-left': '0.75in',
+    'encoding': 'UTF-8',
+    'no-outline': None
+}
+
+# As fontes padrão do FPDF só aceitam latin-1
+_SUBSTITUICOES_LATIN1 = str.maketrans({'₂': '2', '•': '-', '–': '-', '—': '-'})
+
+# Os motores de PDF só são importados na primeira geração (ou em carregar_motores)
+MOTORES = ('fpdf', 'pdfkit')
+
+_CHAVE_RE = re.compile(r'^(creditos|cenario)_(\d+)_([0-9a-f]{16})$')
+
+
+def _latin1(texto):
+    return texto.translate(_SUBSTITUICOES_LATIN1).encode('latin-1', 'replace').decode('latin-1')
+
+
+def hash_cenario(cenario):
+    """Hash estável dos dados do cenário, usado para endereçar o PDF"""
+    dados = json.dumps(cenario, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(dados.encode('utf-8')).hexdigest()
+
+
+def html_relatorio_creditos(cenario):
+    return render_template('pdf/relatorio_creditos.html',
+                           cenario=cenario,
+                           data_geracao=datetime.now().strftime('%d/%m/%Y às %H:%M'))
+
+
+def html_para_pdf(html):
+    import pdfkit
+    # Sem caminho de saída o wkhtmltopdf escreve no stdout e o pdfkit devolve os bytes
+    return pdfkit.from_string(html, False, options=OPCOES_PDFKIT)
+
+
+def _novo_pdf():
+    from fpdf import FPDF
+    return FPDF()
+
+
+def carregar_motores():
+    """Importa os motores de PDF antes da primeira geração.
+
+    Com ``gunicorn --preload`` o import feito no processo mestre é
+    compartilhado pelos workers criados por fork.
+    """
+    for modulo in MOTORES:
+        importlib.import_module(modulo)
+
+
+def verificar_motores():
+    """Lista os problemas que impediriam a geração de PDFs; vazia se está tudo instalado"""
+    problemas = []
+    for modulo in MOTORES:
+        try:
+            importlib.import_module(modulo)
+        except ImportError:
+            problemas.append(f'Módulo {modulo} não instalado (pip install -r requirements.txt)')
+    if shutil.which('wkhtmltopdf') is None:
+        problemas.append('Executável wkhtmltopdf não encontrado no PATH')
+    return problemas
+
+
+@click.command('verificar-pdf')
+def verificar_pdf():
+    """Verifica se as dependências de geração de PDF estão instaladas"""
+    problemas = verificar_motores()
+    for problema in problemas:
+        click.echo(problema, err=True)
+    if problemas:
+        raise SystemExit(1)
+    click.echo('Dependências de PDF instaladas')
+
+
+def renderizar_relatorio_creditos(cenario):
+    """Relatório de créditos a partir do template HTML, via wkhtmltopdf"""
+    return html_para_pdf(html_relatorio_creditos(cenario))
+
+
+def renderizar_relatorio_cenario(cenario):
+    """Relatório com os detalhes do cenário, montado com FPDF"""
+    pdf = _novo_pdf()
+    _escrever_cenario(pdf, cenario)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def renderizar_portfolio(resumo, cenarios):
+    """PDF único com a página de resumo do portfólio e uma página por cenário"""
+    pdf = _novo_pdf()
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, _latin1('Portfólio de Créditos de Carbono'), ln=True, align='C')
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 8, _latin1(f'Gerado em {datetime.now().strftime("%d/%m/%Y às %H:%M")}'), ln=True, align='C')
+    pdf.ln(10)
+    
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Resumo:', ln=True)
+    pdf.set_font('Arial', '', 12)
+    pdf.cell(0, 10, _latin1(f'Total de Cenários: {resumo["total_cenarios"]}'), ln=True)
+    pdf.cell(0, 10, _latin1(f'Total de Créditos: {resumo["total_creditos"]:,.2f} tCO₂e'), ln=True)
+    pdf.cell(0, 10, _latin1(f'Valor Estimado: R$ {resumo["valor_estimado"]:,.2f}'), ln=True)
+    pdf.cell(0, 10, _latin1(f'Área Total: {resumo["area_total"]:,.2f} hectares'), ln=True)
+    pdf.ln(5)
+    
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, _latin1('Créditos por Metodologia:'), ln=True)
+    pdf.set_font('Arial', '', 12)
+    for metodologia, creditos in resumo['totais'].items():
+        nome = metodologia.replace('credito_', '').title()
+        pdf.cell(0, 10, _latin1(f'  {nome}: {creditos:,.2f} tCO₂e'), ln=True)
+    pdf.ln(5)
+    
+    # Índice dos cenários incluídos
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, _latin1('Cenários:'), ln=True)
+    pdf.set_font('Arial', '', 10)
+    for cenario in cenarios:
+        pdf.cell(0, 7, _latin1(f'• {cenario.get("nome_cenario", "")} - '
+                               f'{cenario.get("total_creditos", 0):,.2f} tCO₂e'), ln=True)
+    
+    for cenario in cenarios:
+        _escrever_cenario(pdf, cenario)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+def _escrever_cenario(pdf, cenario):
+    pdf.add_page()
+    
+    # Configurar fonte
+    pdf.set_font('Arial', 'B', 16)
+    
+    # Título
+    pdf.cell(0, 10, _latin1(f'Relatório de Créditos de Carbono - {cenario["nome_cenario"]}'), ln=True, align='C')
+    pdf.ln(10)
+    
+    # Informações do cenário
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, _latin1('Informações do Cenário:'), ln=True)
+    pdf.set_font('Arial', '', 12)
+    pdf.cell(0, 10, _latin1(f'Localização: {cenario["localizacao"]}'), ln=True)
+    pdf.cell(0, 10, _latin1(f'Área Total: {cenario["area_total"]} hectares'), ln=True)
+    pdf.cell(0, 10, _latin1(f'Total de Créditos: {cenario["total_creditos"]} tCO₂e'), ln=True)
+    pdf.cell(0, 10, _latin1(f'Valor Estimado: R$ {cenario["valor_estimado"]:,.2f}'), ln=True)
+    pdf.ln(10)
+    
+    # Metodologias
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Metodologias:', ln=True)
+    pdf.set_font('Arial', '', 12)
+    for metodologia in cenario['metodologias']:
+        pdf.cell(0, 10, _latin1(f'• {metodologia}'), ln=True)
+    pdf.ln(10)
+    
+    # Resultados por metodologia
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Resultados por Metodologia:', ln=True)
+    pdf.set_font('Arial', '', 12)
+    for metodologia, resultado in cenario['resultados'].items():
+        if resultado:
+            pdf.cell(0, 10, _latin1(f'{metodologia.title()}:'), ln=True)
+            pdf.cell(0, 10, _latin1(f'  Créditos: {resultado["creditos"]} tCO₂e'), ln=True)
+            pdf.cell(0, 10, _latin1(f'  Valor: R$ {resultado["valor"]:,.2f}'), ln=True)
+            pdf.ln(5)
+
+
+RENDERIZADORES = {
+    'creditos': renderizar_relatorio_creditos,
+    'cenario': renderizar_relatorio_cenario,
+}
+
+
+class CachePDF:
+    """Relatórios PDF já gerados, endereçados pelo id e pelo hash do cenário.
+
+    Os PDFs ficam em memória, limitados por ``PDF_CACHE_MAX_BYTES`` e
+    removidos por ordem de uso; nada é gravado em disco. Um cenário que não
+    mudou é servido direto do cache; os demais são renderizados no pool de
+    tarefas em segundo plano.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self._pdfs = OrderedDict()
+        self._bytes = 0
+        self.stats = EstatisticasCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_bytes = app.config['PDF_CACHE_MAX_BYTES']
+        self.max_idade = app.config['PDF_CACHE_MAX_IDADE']
+        if app.config['PDF_PRECARREGAR']:
+            carregar_motores()
+        app.cli.add_command(verificar_pdf)
+        app.extensions['pdf_cache'] = self
+
+    @staticmethod
+    def chave(tipo, id, cenario):
+        return f'{tipo}_{id}_{hash_cenario(cenario)[:16]}'
+
+    @staticmethod
+    def interpretar_chave(chave):
+        """Retorna ``(tipo, id)`` de uma chave válida ou None"""
+        encontrado = _CHAVE_RE.match(chave)
+        if encontrado is None:
+            return None
+        return encontrado.group(1), int(encontrado.group(2))
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._pdfs.get(chave)
+            if item is None:
+                self.stats.falhas += 1
+                return None
+            conteudo, criado_em = item
+            if criado_em < time.monotonic() - self.max_idade:
+                self._remover(chave)
+                self.stats.expiradas += 1
+                self.stats.falhas += 1
+                return None
+            self._pdfs.move_to_end(chave)
+            self.stats.acertos += 1
+            return conteudo
+
+    def guardar(self, chave, conteudo):
+        with self._lock:
+            if chave in self._pdfs:
+                self._remover(chave)
+            self._pdfs[chave] = (conteudo, time.monotonic())
+            self._bytes += len(conteudo)
+            while self._bytes > self.max_bytes and len(self._pdfs) > 1:
+                self._remover(next(iter(self._pdfs)))
+                self.stats.removidas += 1
+
+    def _remover(self, chave):
+        conteudo, _ = self._pdfs.pop(chave)
+        self._bytes -= len(conteudo)
+
+    def gerar(self, tipo, cenario, chave):
+        """Renderiza o PDF na thread atual e o guarda no cache"""
+        inicio = time.perf_counter()
+        conteudo = RENDERIZADORES[tipo](cenario)
+        duracao = time.perf_counter() - inicio
+        acumular('pdf', duracao)
+        get_metricas().observar('pdf_render_seconds', duracao, tipo=tipo)
+        self.guardar(chave, conteudo)
+        return conteudo
+
+    def estatisticas(self):
+        dados = self.stats.to_dict()
+        with self._lock:
+            dados['entradas'] = len(self._pdfs)
+            dados['bytes'] = self._bytes
+        return dados
+
+    def solicitar(self, tipo, id, cenario):
+        """Retorna ``(chave, conteudo, tarefa)``.
+
+        ``conteudo`` vem preenchido quando o PDF já está em cache; caso
+        contrário ``tarefa`` é a geração em andamento (reaproveitada se
+        outra requisição já a tiver iniciado).
+        """
+        chave = self.chave(tipo, id, cenario)
+        conteudo = self.obter(chave)
+        if conteudo is not None:
+            return chave, conteudo, None
+        with self._lock:
+            tarefa = self._em_andamento.get(chave)
+            if tarefa is None:
+                tarefa = get_tarefas().iniciar('pdf', self._gerar, tipo, cenario, chave, total=1)
+                self._em_andamento[chave] = tarefa
+        return chave, None, tarefa
+
+    def _gerar(self, tarefa, tipo, cenario, chave):
+        try:
+            conteudo = self.gerar(tipo, cenario, chave)
+            tarefa.concluidos = 1
+            return {'chave': chave, 'tamanho': len(conteudo)}
+        finally:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+
+
+def get_pdf_cache():
+    return current_app.extensions['pdf_cache']
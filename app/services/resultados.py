@@ -0,0 +1,48 @@
+import secrets
+
+from flask import current_app
+
+from .cache import criar_cache
+
+
+class ResultadosCalculo:
+    """Resultados de cálculo guardados no servidor e referenciados por um id curto.
+
+    Sessão e URLs carregam apenas o id. Com ``RESULTADOS_BACKEND=sqlite``
+    (padrão) qualquer worker encontra o resultado; ``memory`` devolve o
+    mesmo objeto já interpretado, mas só serve com um único worker.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.store = criar_cache(app.config, 'RESULTADOS')
+        app.extensions['resultados_calculo'] = self
+
+    @staticmethod
+    def chave(id):
+        return f'resultado:{id}'
+
+    def guardar(self, resultados):
+        id = secrets.token_urlsafe(9)
+        self.store.set(self.chave(id), resultados)
+        return id
+
+    def obter(self, id):
+        """Resultado pelo id, ou None se não existe ou expirou"""
+        if not id:
+            return None
+        return self.store.get(self.chave(id))
+
+    def estatisticas(self):
+        dados = self.store.stats.to_dict()
+        dados['entradas'] = len(self.store)
+        dados['backend'] = type(self.store).__name__
+        return dados
+
+
+def get_resultados():
+    return current_app.extensions['resultados_calculo']
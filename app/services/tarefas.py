@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .cache import criar_cache
+
+
+class Tarefa:
+    """Estado de uma tarefa em segundo plano, consultável pelo navegador"""
+
+    def __init__(self, tipo, total=0):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.status = 'pendente'
+        self.total = total
+        self.concluidos = 0
+        self.falhas = 0
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.atualizada_em = self.criada_em
+        self.futuro = None
+
+    @property
+    def finalizada(self):
+        return self.status in ('concluida', 'falhou')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'total': self.total,
+            'concluidos': self.concluidos,
+            'falhas': self.falhas,
+            'progresso': self.concluidos / self.total if self.total else (1.0 if self.finalizada else 0.0),
+            'resultado': self.resultado,
+            'erro': self.erro,
+            'criada_em': self.criada_em,
+            'atualizada_em': self.atualizada_em,
+        }
+
+
+class GerenciadorTarefas:
+    """Executa tarefas em pools de threads e publica o progresso.
+
+    Tarefas que percorrem um lote inteiro (``TIPOS_LONGOS``) rodam em um
+    pool próprio de ``TAREFAS_LONGAS_WORKERS`` threads, para que PDFs e
+    revalidações sempre encontrem uma thread livre. O estado é gravado no
+    armazenamento configurado em ``TAREFAS_BACKEND``; com ``sqlite``
+    qualquer worker do gunicorn consegue responder à consulta.
+    """
+
+    TIPOS_LONGOS = frozenset({'calculo_lote', 'exclusao'})
+
+    def __init__(self, app=None):
+        self._executores = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.store = criar_cache(app.config, 'TAREFAS')
+        self.max_workers = app.config['TAREFAS_WORKERS']
+        self.max_workers_longas = app.config['TAREFAS_LONGAS_WORKERS']
+        self.intervalo_publicacao = app.config['TAREFAS_INTERVALO_PUBLICACAO']
+        app.extensions['tarefas'] = self
+
+    def executor(self, tipo):
+        """Pool que executa as tarefas do ``tipo`` informado"""
+        pool = 'longa' if tipo in self.TIPOS_LONGOS else 'tarefa'
+        # Threads não sobrevivem ao fork: cada worker cria os seus pools
+        pid = os.getpid()
+        if self._pid != pid or pool not in self._executores:
+            with self._lock:
+                if self._pid != pid:
+                    self._executores = {}
+                    self._pid = pid
+                if pool not in self._executores:
+                    max_workers = self.max_workers_longas if pool == 'longa' else self.max_workers
+                    self._executores[pool] = ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix=pool)
+        return self._executores[pool]
+
+    def iniciar(self, tipo, funcao, *args, total=0, **kwargs):
+        """Agenda ``funcao(tarefa, *args, **kwargs)`` e retorna a tarefa criada.
+
+        A função roda dentro de um contexto da aplicação; o seu retorno vira
+        o ``resultado`` da tarefa. ``tarefa.futuro`` permite aguardar o fim
+        da execução no próprio worker.
+        """
+        tarefa = Tarefa(tipo, total=total)
+        self.publicar(tarefa)
+        tarefa.futuro = self.executor(tipo).submit(self._executar, tarefa, funcao, args, kwargs)
+        return tarefa
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        tarefa.status = 'executando'
+        self.publicar(tarefa)
+        with self.app.app_context():
+            try:
+                tarefa.resultado = funcao(tarefa, *args, **kwargs)
+                tarefa.status = 'concluida'
+            except Exception as e:
+                tarefa.erro = str(e)
+                tarefa.status = 'falhou'
+                self.app.logger.exception('Tarefa %s (%s) falhou', tarefa.id, tarefa.tipo)
+        self.publicar(tarefa)
+
+    def publicar(self, tarefa, forcar=True):
+        """Grava o estado da tarefa; sem ``forcar``, no máximo a cada intervalo"""
+        agora = time.time()
+        if not forcar and agora - tarefa.atualizada_em < self.intervalo_publicacao:
+            return
+        tarefa.atualizada_em = agora
+        self.store.set(f'tarefa:{tarefa.id}', tarefa.to_dict())
+
+    def obter(self, tarefa_id):
+        return self.store.get(f'tarefa:{tarefa_id}')
+
+
+def get_tarefas():
+    return current_app.extensions['tarefas']
@@ -0,0 +1,125 @@
+"""Backend falso para os benchmarks do frontend.
+
+Implementa ``/api/cenarios``, ``/api/cenarios/<id>`` e ``/api/calcular``
+com uma massa de cenários gerada a partir de uma semente e uma latência
+configurável por requisição. Pode ser usado pelo ``benchmarks.carga`` ou
+iniciado sozinho:
+
+    python -m benchmarks.backend_stub --porta 5001 --cenarios 500 --latencia 0.05
+"""
+import argparse
+import random
+import threading
+import time
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+ESTADOS = ('MG', 'SP', 'PR', 'GO', 'MT', 'MS', 'BA', 'RS')
+METODOLOGIAS = ('VM0032', 'VM0042', 'AR-ACM0003', 'VM0017')
+
+# Componente -> (campo de área, créditos por hectare, metodologia)
+FATORES = {
+    'pastagem': ('area_pastagem', 0.7, 'VM0032'),
+    'florestal': ('area_florestal', 10.0, 'AR-ACM0003'),
+    'renovacao': ('area_renovacao_cultura', 0.5, 'VM0042'),
+    'integracao': ('area_integracao_lavoura', 1.5, 'VM0017'),
+}
+PRECO_CREDITO = 50.0
+
+
+def calcular(areas):
+    """Resultado no formato de ``/api/calcular`` para as áreas informadas"""
+    resultados = {}
+    for componente, (campo, fator, metodologia) in FATORES.items():
+        area = float(areas.get(campo) or 0)
+        creditos = round(area * fator, 2)
+        resultados[componente] = {'area': area, 'creditos': creditos, 'fator': fator,
+                                  'metodologia': metodologia, 'valor': round(creditos * PRECO_CREDITO, 2)}
+    total = round(sum(r['creditos'] for r in resultados.values()), 2)
+    return {'total_creditos': total, 'valor_estimado': round(total * PRECO_CREDITO, 2), 'resultados': resultados}
+
+
+def gerar_cenarios(quantidade, semente=42):
+    """Cenários com áreas e localização aleatórias, sempre os mesmos para a mesma semente"""
+    sorteio = random.Random(semente)
+    cenarios = {}
+    for id in range(1, quantidade + 1):
+        areas = {campo: round(sorteio.uniform(0, 500), 1) for campo, _, _ in FATORES.values()}
+        resultado = calcular(areas)
+        cenario = dict(areas, id=id,
+                       nome_cenario=f'Fazenda {id}',
+                       localizacao=sorteio.choice(ESTADOS),
+                       data_calculo=f'2024-{sorteio.randint(1, 12):02d}-{sorteio.randint(1, 28):02d}',
+                       area_total=round(sum(areas.values()), 1),
+                       metodologias=sorted(sorteio.sample(METODOLOGIAS, 2)),
+                       total_creditos=resultado['total_creditos'],
+                       valor_estimado=resultado['valor_estimado'],
+                       resultados=resultado['resultados'])
+        for componente, valores in resultado['resultados'].items():
+            cenario[f'credito_{componente}'] = valores['creditos']
+        cenarios[id] = cenario
+    return cenarios
+
+
+def criar_stub(cenarios=200, latencia=0.02, variacao=0.0, semente=42):
+    """App Flask do backend falso.
+
+    Cada requisição espera ``latencia`` segundos mais um valor aleatório
+    de até ``variacao``. ``/api/calcular`` devolve o id de um cenário já
+    existente, de modo que a massa não cresce durante o benchmark.
+    """
+    app = Flask(__name__)
+    dados = gerar_cenarios(cenarios, semente)
+    lista = list(dados.values())
+
+    @app.before_request
+    def simular_latencia():
+        espera = latencia + (random.uniform(0, variacao) if variacao else 0)
+        if espera > 0:
+            time.sleep(espera)
+
+    @app.get('/api/cenarios')
+    def listar_cenarios():
+        return jsonify(lista)
+
+    @app.get('/api/cenarios/<int:id>')
+    def obter_cenario(id):
+        cenario = dados.get(id)
+        if cenario is None:
+            return jsonify({'erro': 'Cenário não encontrado'}), 404
+        return jsonify(cenario)
+
+    @app.post('/api/calcular')
+    def calcular_creditos():
+        resultado = calcular(request.get_json(silent=True) or {})
+        resultado['id'] = random.randint(1, len(lista)) if lista else None
+        return jsonify(resultado)
+
+    return app
+
+
+def iniciar_servidor(app, host='127.0.0.1', porta=0):
+    """Serve ``app`` em uma thread, com uma thread por requisição; retorna o servidor"""
+    servidor = make_server(host, porta, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, name=f'servidor-{servidor.port}', daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backend falso para os benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=5001)
+    parser.add_argument('--cenarios', type=int, default=200, help='quantidade de cenários (200)')
+    parser.add_argument('--latencia', type=float, default=0.02, help='latência fixa em segundos (0.02)')
+    parser.add_argument('--variacao', type=float, default=0.0, help='latência aleatória adicional em segundos (0)')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    app = criar_stub(args.cenarios, args.latencia, args.variacao, args.semente)
+    servidor = make_server(args.host, args.porta, app, threaded=True)
+    print(f'Backend falso em http://{args.host}:{servidor.port} com {args.cenarios} cenários')
+    servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""Teste de carga das principais rotas do frontend.
+
+Sem ``--url``, sobe o backend falso (``benchmarks.backend_stub``) e a
+aplicação criada por ``create_app`` em servidores locais, e dispara as
+requisições de cada rota com ``--concorrencia`` clientes simultâneos:
+
+    python -m benchmarks.carga --requisicoes 300 --concorrencia 16 --latencia 0.05
+
+A configuração da aplicação segue as variáveis de ambiente de sempre
+(``CACHE_TTL=0``, ``ASYNC_VIEWS=true`` etc.). Com ``--saida`` os números
+são gravados em JSON; com ``--comparar`` são confrontados com uma execução
+anterior e o comando termina com código 1 se alguma rota piorou além da
+``--tolerancia``.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .backend_stub import criar_stub, iniciar_servidor
+
+
+def _dashboard(sessao, url, id, sorteio):
+    return sessao.get(f'{url}/dashboard')
+
+
+def _detalhes(sessao, url, id, sorteio):
+    return sessao.get(f'{url}/detalhes/{id}')
+
+
+def _impacto_real(sessao, url, id, sorteio):
+    return sessao.get(f'{url}/impacto-real/{id}')
+
+
+def _creditos(sessao, url, id, sorteio):
+    # Áreas sorteadas: a maior parte dos envios não está no cache de cálculos
+    areas = {campo: round(sorteio.uniform(0, 500), 1) for campo in
+             ('area_pastagem', 'area_florestal', 'area_renovacao_cultura', 'area_integracao_lavoura')}
+    return sessao.post(f'{url}/creditos', data=areas)
+
+
+def _pdf_cenario(sessao, url, id, sorteio):
+    return sessao.get(f'{url}/gerar-pdf/{id}')
+
+
+def _pdf_creditos(sessao, url, id, sorteio):
+    return sessao.get(f'{url}/exportar-pdf/creditos/{id}')
+
+
+# Nome -> (requisição, tipo de conteúdo esperado na resposta final)
+ROTAS = {
+    'dashboard': (_dashboard, 'text/html'),
+    'detalhes': (_detalhes, 'text/html'),
+    'impacto_real': (_impacto_real, 'text/html'),
+    'creditos': (_creditos, 'text/html'),
+    'pdf_cenario': (_pdf_cenario, 'application/pdf'),
+    'pdf_creditos': (_pdf_creditos, 'application/pdf'),
+}
+
+
+def percentil(valores, fracao):
+    """Percentil pelo método do posto mais próximo; ``valores`` já ordenados"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(fracao * len(valores)) - 1)]
+
+
+class _Cliente(threading.local):
+    """Uma sessão HTTP (com cookies e conexões próprias) por thread"""
+
+    def __init__(self):
+        self.sessao = requests.Session()
+        self.sorteio = random.Random(threading.get_ident())
+
+
+def executar_rota(url, nome, requisicoes, concorrencia, cenarios, aquecimento=0):
+    """Dispara ``requisicoes`` chamadas da rota e retorna as estatísticas"""
+    funcao, esperado = ROTAS[nome]
+    cliente = _Cliente()
+    falhas = {}
+    lock = threading.Lock()
+
+    def chamar(_):
+        id = cliente.sorteio.randint(1, cenarios)
+        inicio = time.perf_counter()
+        try:
+            response = funcao(cliente.sessao, url, id, cliente.sorteio)
+            motivo = None
+            if response.status_code >= 400:
+                motivo = f'HTTP {response.status_code}'
+            elif not response.headers.get('Content-Type', '').startswith(esperado):
+                # Erros das views viram flash + redirect para o dashboard
+                motivo = f'resposta {response.headers.get("Content-Type", "").split(";")[0]}'
+        except requests.RequestException as e:
+            motivo = type(e).__name__
+        duracao = time.perf_counter() - inicio
+        if motivo is not None:
+            with lock:
+                falhas[motivo] = falhas.get(motivo, 0) + 1
+        return duracao
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(chamar, range(aquecimento)))
+        falhas.clear()
+        inicio = time.perf_counter()
+        duracoes = sorted(executor.map(chamar, range(requisicoes)))
+        total = time.perf_counter() - inicio
+
+    return {
+        'requisicoes': requisicoes,
+        'erros': sum(falhas.values()),
+        'motivos': falhas,
+        'req_s': requisicoes / total if total else 0.0,
+        'p50': percentil(duracoes, 0.50),
+        'p90': percentil(duracoes, 0.90),
+        'p99': percentil(duracoes, 0.99),
+        'max': duracoes[-1] if duracoes else 0.0,
+    }
+
+
+def imprimir(resultados):
+    print(f'{"rota":<14}{"req":>7}{"erros":>7}{"req/s":>10}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+    for nome, r in resultados.items():
+        print(f'{nome:<14}{r["requisicoes"]:>7}{r["erros"]:>7}{r["req_s"]:>10.1f}'
+              f'{r["p50"] * 1000:>10.1f}{r["p90"] * 1000:>10.1f}{r["p99"] * 1000:>10.1f}{r["max"] * 1000:>10.1f}')
+        for motivo, quantidade in sorted(r['motivos'].items()):
+            print(f'{"":<14}{quantidade:>7} x {motivo}')
+
+
+def comparar(resultados, base, tolerancia):
+    """Mensagens das rotas que ficaram mais lentas que ``base`` além da tolerância"""
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            continue
+        if atual['req_s'] < anterior['req_s'] * (1 - tolerancia):
+            regressoes.append(f'{nome}: {atual["req_s"]:.1f} req/s (antes {anterior["req_s"]:.1f})')
+        if atual['p90'] > anterior['p90'] * (1 + tolerancia):
+            regressoes.append(f'{nome}: p90 {atual["p90"] * 1000:.1f} ms (antes {anterior["p90"] * 1000:.1f} ms)')
+        if atual['erros'] > anterior['erros']:
+            regressoes.append(f'{nome}: {atual["erros"]} erros (antes {anterior["erros"]})')
+    return regressoes
+
+
+def _iniciar_frontend(backend_url):
+    # config.py lê o ambiente na importação: a URL do backend vem antes do import
+    os.environ['BACKEND_URL'] = backend_url
+    from app import create_app
+    app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
+    return iniciar_servidor(app)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Teste de carga do frontend')
+    parser.add_argument('--url', help='frontend já em execução; por padrão sobe um local com o backend falso')
+    parser.add_argument('--rotas', default=','.join(ROTAS), help=f'rotas separadas por vírgula ({",".join(ROTAS)})')
+    parser.add_argument('--requisicoes', type=int, default=200, help='requisições por rota (200)')
+    parser.add_argument('--concorrencia', type=int, default=8, help='clientes simultâneos (8)')
+    parser.add_argument('--aquecimento', type=int, default=10, help='requisições descartadas antes da medição (10)')
+    parser.add_argument('--cenarios', type=int, default=200, help='cenários do backend falso (200)')
+    parser.add_argument('--latencia', type=float, default=0.02, help='latência do backend falso em segundos (0.02)')
+    parser.add_argument('--variacao', type=float, default=0.0, help='latência aleatória adicional do backend falso (0)')
+    parser.add_argument('--saida', help='grava os resultados neste arquivo JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='piora aceita na comparação (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    rotas = [nome.strip() for nome in args.rotas.split(',') if nome.strip()]
+    desconhecidas = [nome for nome in rotas if nome not in ROTAS]
+    if desconhecidas:
+        parser.error(f'rotas desconhecidas: {", ".join(desconhecidas)}')
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    servidores = []
+    url = args.url
+    if url is None:
+        stub = iniciar_servidor(criar_stub(args.cenarios, args.latencia, args.variacao))
+        frontend = _iniciar_frontend(f'http://127.0.0.1:{stub.port}')
+        servidores = [frontend, stub]
+        url = f'http://127.0.0.1:{frontend.port}'
+    url = url.rstrip('/')
+
+    try:
+        resultados = {}
+        for nome in rotas:
+            resultados[nome] = executar_rota(url, nome, args.requisicoes, args.concorrencia,
+                                             args.cenarios, args.aquecimento)
+    finally:
+        for servidor in servidores:
+            servidor.shutdown()
+
+    imprimir(resultados)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultados, json.load(arquivo), args.tolerancia)
+        for mensagem in regressoes:
+            print(f'REGRESSÃO {mensagem}')
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
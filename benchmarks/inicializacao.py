@@ -0,0 +1,111 @@
+"""Tempo de inicialização de um worker, com e sem ``--preload``.
+
+Sem preload cada worker é um processo novo que importa a aplicação e
+chama ``create_app``. Com preload (como no ``gunicorn --preload``) isso é
+feito uma vez no processo mestre e os workers são criados por fork, já
+com a aplicação pronta. Nos dois casos também são medidos a primeira
+requisição e o primeiro PDF, que pagam os imports tardios:
+
+    python -m benchmarks.inicializacao --repeticoes 10
+    PDF_PRECARREGAR=true python -m benchmarks.inicializacao --repeticoes 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from .backend_stub import gerar_cenarios
+
+ETAPAS = ('import', 'create_app', 'primeira_requisicao', 'primeiro_pdf')
+
+
+def _primeiro_uso(app):
+    """Tempos da primeira requisição (página inicial, sem backend) e do primeiro PDF"""
+    from app.services.pdf import RENDERIZADORES
+    tempos = {}
+    inicio = time.perf_counter()
+    app.test_client().get('/')
+    tempos['primeira_requisicao'] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    with app.app_context():
+        RENDERIZADORES['cenario'](gerar_cenarios(1)[1])
+    tempos['primeiro_pdf'] = time.perf_counter() - inicio
+    return tempos
+
+
+def _criar_app():
+    inicio = time.perf_counter()
+    from app import create_app
+    importado = time.perf_counter()
+    app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
+    return app, {'import': importado - inicio, 'create_app': time.perf_counter() - importado}
+
+
+def worker_sem_preload():
+    """Executado em um processo novo: mede o boot completo do worker"""
+    app, tempos = _criar_app()
+    tempos.update(_primeiro_uso(app))
+    print(json.dumps(tempos))
+
+
+def workers_com_preload(repeticoes):
+    """Carrega a aplicação uma vez e mede cada worker criado por fork"""
+    app, tempos_mestre = _criar_app()
+    medicoes = []
+    for _ in range(repeticoes):
+        leitura, escrita = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(leitura)
+            tempos = dict(_primeiro_uso(app), **{'import': 0.0, 'create_app': 0.0})
+            os.write(escrita, json.dumps(tempos).encode('utf-8'))
+            os._exit(0)
+        os.close(escrita)
+        with os.fdopen(leitura, 'rb') as saida:
+            medicoes.append(json.loads(saida.read()))
+        os.waitpid(pid, 0)
+    print(json.dumps({'mestre': tempos_mestre, 'workers': medicoes}))
+
+
+def _executar(*argumentos):
+    saida = subprocess.run([sys.executable, '-m', 'benchmarks.inicializacao', *argumentos],
+                           check=True, capture_output=True, text=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def _mediana(medicoes, etapa):
+    return statistics.median(m[etapa] for m in medicoes) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tempo de inicialização dos workers')
+    parser.add_argument('--repeticoes', type=int, default=5, help='workers medidos em cada modo (5)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--preload', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Modos internos, executados em subprocessos limpos
+    if args.worker:
+        return worker_sem_preload()
+    if args.preload:
+        return workers_com_preload(args.preload)
+
+    sem_preload = [_executar('--worker') for _ in range(args.repeticoes)]
+    modos = {'sem preload': sem_preload}
+    if hasattr(os, 'fork'):
+        preload = _executar('--preload', str(args.repeticoes))
+        modos['preload (mestre)'] = [preload['mestre']]
+        modos['preload (worker)'] = preload['workers']
+
+    print(f'Medianas em ms (PDF_PRECARREGAR={os.environ.get("PDF_PRECARREGAR", "false")})')
+    print(f'{"modo":<18}' + ''.join(f'{etapa:>21}' for etapa in ETAPAS))
+    for nome, medicoes in modos.items():
+        print(f'{nome:<18}' + ''.join(f'{_mediana(medicoes, etapa):>21.1f}' if etapa in medicoes[0] else f'{"-":>21}'
+                                      for etapa in ETAPAS))
+
+
+if __name__ == '__main__':
+    main()
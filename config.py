@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,6 +8,152 @@ class Config:
     SECRET_KEY = os.environ.get('FLASK_SECRET_KEY', 'chave_secreta_temporaria')
     BACKEND_URL = os.environ.get('BACKEND_URL', 'http://localhost:5000')
 
+    # Cliente HTTP do backend (pool de conexões por worker)
+    BACKEND_POOL_CONNECTIONS = int(os.environ.get('BACKEND_POOL_CONNECTIONS', 10))
+    BACKEND_POOL_MAXSIZE = int(os.environ.get('BACKEND_POOL_MAXSIZE', 20))
+    BACKEND_CONNECT_TIMEOUT = float(os.environ.get('BACKEND_CONNECT_TIMEOUT', 3.05))
+    BACKEND_READ_TIMEOUT = float(os.environ.get('BACKEND_READ_TIMEOUT', 15))
+    BACKEND_RETRIES = int(os.environ.get('BACKEND_RETRIES', 2))
+    BACKEND_BACKOFF_FACTOR = float(os.environ.get('BACKEND_BACKOFF_FACTOR', 0.3))
+
+    # Cache das respostas de cenários ('memory' ou 'sqlite' para compartilhar entre workers)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', 512))
+    CACHE_TTL = float(os.environ.get('CACHE_TTL', 30))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH',
+                                       os.path.join(tempfile.gettempdir(), 'frontendcarbon_cache.sqlite3'))
+    # Reserva com a última versão boa de cada entrada, servida com o backend fora do ar
+    CACHE_RESERVA_BACKEND = os.environ.get('CACHE_RESERVA_BACKEND', CACHE_BACKEND)
+    CACHE_RESERVA_MAXSIZE = int(os.environ.get('CACHE_RESERVA_MAXSIZE', CACHE_MAXSIZE))
+    CACHE_RESERVA_TTL = float(os.environ.get('CACHE_RESERVA_TTL', 24 * 3600))
+    CACHE_RESERVA_SQLITE_PATH = os.environ.get('CACHE_RESERVA_SQLITE_PATH',
+                                               os.path.join(tempfile.gettempdir(), 'frontendcarbon_reserva.sqlite3'))
+    # Intervalo mínimo entre as tentativas de atualizar uma entrada servida da reserva
+    REVALIDACAO_INTERVALO = float(os.environ.get('REVALIDACAO_INTERVALO', 5))
+
+    # Circuito por rota do backend: abre quando a fração de erros nas últimas
+    # CIRCUITO_JANELA chamadas passa do limite e recusa chamadas por CIRCUITO_TEMPO_ABERTO segundos
+    CIRCUITO_ATIVO = os.environ.get('CIRCUITO_ATIVO', 'true').lower() == 'true'
+    CIRCUITO_JANELA = int(os.environ.get('CIRCUITO_JANELA', 20))
+    CIRCUITO_MIN_CHAMADAS = int(os.environ.get('CIRCUITO_MIN_CHAMADAS', 5))
+    CIRCUITO_LIMITE_ERROS = float(os.environ.get('CIRCUITO_LIMITE_ERROS', 0.5))
+    CIRCUITO_TEMPO_ABERTO = float(os.environ.get('CIRCUITO_TEMPO_ABERTO', 30))
+
+    # Paginação da lista de cenários do dashboard
+    DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', 50))
+    DASHBOARD_MAX_PAGE_SIZE = int(os.environ.get('DASHBOARD_MAX_PAGE_SIZE', 500))
+    # O backend aceita page/limit/ordem/direcao/localizacao/metodologia em /api/cenarios
+    BACKEND_PAGINATION = os.environ.get('BACKEND_PAGINATION', 'false').lower() == 'true'
+
+    # Tarefas em segundo plano (estado em 'memory' ou 'sqlite' para consulta por qualquer worker)
+    TAREFAS_WORKERS = int(os.environ.get('TAREFAS_WORKERS', 4))
+    # Lotes e exclusões em massa têm um pool próprio e não ocupam os de PDFs e revalidações
+    TAREFAS_LONGAS_WORKERS = int(os.environ.get('TAREFAS_LONGAS_WORKERS', 2))
+    TAREFAS_BACKEND = os.environ.get('TAREFAS_BACKEND', 'memory')
+    TAREFAS_MAXSIZE = int(os.environ.get('TAREFAS_MAXSIZE', 1000))
+    TAREFAS_TTL = float(os.environ.get('TAREFAS_TTL', 3600))
+    TAREFAS_SQLITE_PATH = os.environ.get('TAREFAS_SQLITE_PATH',
+                                         os.path.join(tempfile.gettempdir(), 'frontendcarbon_tarefas.sqlite3'))
+    TAREFAS_INTERVALO_PUBLICACAO = float(os.environ.get('TAREFAS_INTERVALO_PUBLICACAO', 0.5))
+
+    # Exclusão em lote de cenários
+    BULK_DELETE_CONCURRENCY = int(os.environ.get('BULK_DELETE_CONCURRENCY', 8))
+    BULK_DELETE_BACKGROUND = os.environ.get('BULK_DELETE_BACKGROUND', 'true').lower() == 'true'
+    # Tenta POST /api/cenarios/excluir-lote antes de excluir id por id
+    BACKEND_BULK_DELETE = os.environ.get('BACKEND_BULK_DELETE', 'true').lower() == 'true'
+
+    # Geração de PDFs em segundo plano e cache em memória por conteúdo do cenário
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    PDF_CACHE_MAX_IDADE = float(os.environ.get('PDF_CACHE_MAX_IDADE', 24 * 3600))
+    # Tempo que a requisição espera antes de mostrar a página de acompanhamento
+    PDF_ESPERA_MAXIMA = float(os.environ.get('PDF_ESPERA_MAXIMA', 2))
+    # Importa o FPDF e o pdfkit já na inicialização, em vez de no primeiro PDF
+    # (com gunicorn --preload o import fica compartilhado entre os workers)
+    PDF_PRECARREGAR = os.environ.get('PDF_PRECARREGAR', 'false').lower() == 'true'
+
+    # Exportação de relatórios em lote (0 processos = número de CPUs)
+    PDF_LOTE_PROCESSOS = int(os.environ.get('PDF_LOTE_PROCESSOS', 0))
+    PDF_LOTE_CONCORRENCIA_BUSCA = int(os.environ.get('PDF_LOTE_CONCORRENCIA_BUSCA', 8))
+    PDF_LOTE_MAX_CENARIOS = int(os.environ.get('PDF_LOTE_MAX_CENARIOS', 500))
+
+    # Cache dos resultados de /api/calcular ('memory' ou 'sqlite' para compartilhar entre workers)
+    CALCULO_BACKEND = os.environ.get('CALCULO_BACKEND', 'memory')
+    CALCULO_MAXSIZE = int(os.environ.get('CALCULO_MAXSIZE', 4096))
+    CALCULO_TTL = float(os.environ.get('CALCULO_TTL', 7 * 24 * 3600))
+    CALCULO_SQLITE_PATH = os.environ.get('CALCULO_SQLITE_PATH',
+                                         os.path.join(tempfile.gettempdir(), 'frontendcarbon_calculo.sqlite3'))
+    # Trocar a versão invalida os resultados guardados (ex.: metodologias do backend atualizadas)
+    CALCULO_VERSAO = os.environ.get('CALCULO_VERSAO', '1')
+    # Casas decimais das áreas na chave do cache
+    CALCULO_PRECISAO = int(os.environ.get('CALCULO_PRECISAO', 2))
+
+    # Resultados de cálculo exibidos ao usuário; sessão e URLs guardam só o id
+    # ('sqlite' por padrão: o redirect após o POST pode cair em outro worker)
+    RESULTADOS_BACKEND = os.environ.get('RESULTADOS_BACKEND', 'sqlite')
+    RESULTADOS_MAXSIZE = int(os.environ.get('RESULTADOS_MAXSIZE', 2048))
+    RESULTADOS_TTL = float(os.environ.get('RESULTADOS_TTL', 3600))
+    RESULTADOS_SQLITE_PATH = os.environ.get('RESULTADOS_SQLITE_PATH',
+                                            os.path.join(tempfile.gettempdir(), 'frontendcarbon_resultados.sqlite3'))
+
+    # Cálculo de créditos em lote a partir de CSV/JSON
+    CALCULO_LOTE_DIR = os.environ.get('CALCULO_LOTE_DIR',
+                                      os.path.join(tempfile.gettempdir(), 'calculo_lote'))
+    CALCULO_LOTE_CONCORRENCIA = int(os.environ.get('CALCULO_LOTE_CONCORRENCIA', 8))
+    CALCULO_LOTE_TAMANHO = int(os.environ.get('CALCULO_LOTE_TAMANHO', 100))
+    CALCULO_LOTE_MAX_IDADE = float(os.environ.get('CALCULO_LOTE_MAX_IDADE', 24 * 3600))
+    # Tenta POST /api/calcular-lote antes de calcular propriedade por propriedade
+    BACKEND_BULK_CALCULO = os.environ.get('BACKEND_BULK_CALCULO', 'true').lower() == 'true'
+    # Tamanho máximo de uploads (arquivos de propriedades)
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+
+    # Fatores de equivalência do impacto real (padrão: app/data/equivalencias.json)
+    EQUIVALENCIAS_PATH = os.environ.get('EQUIVALENCIAS_PATH')
+    EQUIVALENCIAS_CACHE_MAXSIZE = int(os.environ.get('EQUIVALENCIAS_CACHE_MAXSIZE', 1024))
+
+    # Cache-Control das páginas: cenários são sempre revalidados (ETag pelo conteúdo);
+    # páginas estáticas, como os estudos de caso, podem ser reaproveitadas pelo navegador
+    CACHE_CONTROL_CENARIOS = os.environ.get('CACHE_CONTROL_CENARIOS', 'private, no-cache')
+    CACHE_CONTROL_ESTATICO = os.environ.get('CACHE_CONTROL_ESTATICO', 'public, max-age=3600')
+
+    # Páginas estáticas renderizadas mantidas em memória, por worker
+    FRAGMENTOS_MAXSIZE = int(os.environ.get('FRAGMENTOS_MAXSIZE', 256))
+    FRAGMENTOS_TTL = float(os.environ.get('FRAGMENTOS_TTL', 24 * 3600))
+
+    # Catálogo de estudos de caso (padrão: app/data/estudos_caso.json), recarregado se o arquivo mudar
+    ESTUDOS_PATH = os.environ.get('ESTUDOS_PATH')
+    ESTUDOS_INTERVALO_VERIFICACAO = float(os.environ.get('ESTUDOS_INTERVALO_VERIFICACAO', 2))
+
+    # Views async para as rotas que dependem do backend (requer httpx e flask[async])
+    ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() == 'true'
+
+    # Métricas das requisições, exportadas em /metrics (formato do Prometheus)
+    METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', 'true').lower() == 'true'
+    # Fração das requisições executadas sob o cProfile (0 desativa)
+    PROFILER_AMOSTRAGEM = float(os.environ.get('PROFILER_AMOSTRAGEM', 0))
+    # Perfis só são gravados para requisições que passam deste tempo, em segundos
+    PROFILER_LIMITE = float(os.environ.get('PROFILER_LIMITE', 1.0))
+    PROFILER_DIR = os.environ.get('PROFILER_DIR',
+                                  os.path.join(tempfile.gettempdir(), 'frontendcarbon_perfis'))
+    PROFILER_MAX_ARQUIVOS = int(os.environ.get('PROFILER_MAX_ARQUIVOS', 50))
+
+    # Dados dos gráficos do dashboard (/api/dashboard/graficos): pontos da série acumulada
+    GRAFICOS_PONTOS = int(os.environ.get('GRAFICOS_PONTOS', 500))
+    GRAFICOS_MAX_PONTOS = int(os.environ.get('GRAFICOS_MAX_PONTOS', 5000))
+    # Compressão das respostas JSON (brotli se o pacote estiver instalado, senão gzip)
+    COMPRESSAO_MINIMO = int(os.environ.get('COMPRESSAO_MINIMO', 1024))
+    COMPRESSAO_NIVEL_GZIP = int(os.environ.get('COMPRESSAO_NIVEL_GZIP', 6))
+    COMPRESSAO_NIVEL_BROTLI = int(os.environ.get('COMPRESSAO_NIVEL_BROTLI', 5))
+
+    # Atualizações do dashboard em tempo real (Server-Sent Events)
+    FEED_MAXSIZE = int(os.environ.get('FEED_MAXSIZE', 1000))
+    # Consulta ao backend enquanto há dashboards abertos (0 = só as alterações deste worker)
+    FEED_INTERVALO_POLLING = float(os.environ.get('FEED_INTERVALO_POLLING', 15))
+    FEED_KEEPALIVE = float(os.environ.get('FEED_KEEPALIVE', 15))
+    # Cada conexão é encerrada após esse tempo e o navegador reconecta sem perder eventos
+    FEED_DURACAO_MAXIMA = float(os.environ.get('FEED_DURACAO_MAXIMA', 300))
+    # Acima desse número de diferenças na consulta, os dashboards são recarregados
+    FEED_MAX_ALTERACOES = int(os.environ.get('FEED_MAX_ALTERACOES', 50))
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
@@ -16,10 +163,11 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     BACKEND_URL = 'http://localhost:5000'
+    BACKEND_RETRIES = 0
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
     'default': DevelopmentConfig
-} 
\ No newline at end of file
+}
@@ -3,5 +3,9 @@ from app import create_app
 
 app = create_app(os.getenv('FLASK_CONFIG', 'default'))
 
+# Em produção, com ASYNC_VIEWS=true, as chamadas ao backend de todas as threads
+# de um worker compartilham um único event loop e pool de conexões:
+#   gunicorn -k gthread -w 4 --threads 32 -b 0.0.0.0:3000 'run:app'
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=3000) 
\ No newline at end of file